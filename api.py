@@ -1,110 +1,860 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Request, Response, request, jsonify, send_from_directory
 import os
+import io
 import tempfile
 import shutil
+import atexit
+import glob
 from pathlib import Path
 from main import extract_papers, convert_cisi_to_markdown
 import threading
+import multiprocessing
+import queue
 import uuid
+import itertools
+import hashlib
+from functools import partial, lru_cache
+from collections import OrderedDict
+import mimetypes
+import orjson
+import pyarrow as pa
+from flask.json.provider import JSONProvider
+from werkzeug.security import safe_join
+from werkzeug.exceptions import NotFound
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import ir_datasets
 from fpdf import FPDF
+from fpdf.enums import XPos, YPos
 from markdown import markdown
 import html
 from tqdm import tqdm
 import re
 import requests
 from bs4 import BeautifulSoup
-import wikipediaapi
-import mwclient
+import asyncio
+import aiohttp
 import html2text
 import time
+from urllib.parse import quote
+from flask_compress import Compress
+
+# orjson options used for every JSON response; numpy scalars can end up in
+# job results, and non-string keys are stringified instead of raising
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson, so jsonify and request.get_json
+    use it instead of the stdlib json module.
+    """
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=ORJSON_OPTIONS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+# Uploads up to this size stay in memory while the request is parsed;
+# larger ones are written straight to a temporary file on disk
+SPOOLED_MAX = 10 * 1024 * 1024
+
+class UploadRequest(Request):
+    """
+    Request class that decides where file uploads are buffered.
+    
+    Small uploads are kept in a SpooledTemporaryFile. Large ones, or ones of
+    unknown size, go to a named temporary file that a job can take over
+    as-is, so a multi-GB upload is written to disk once instead of twice.
+    Named files that no job claims are removed at the end of the request.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Paths of uploads written to named temporary files, until claimed
+        self.upload_paths = []
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= SPOOLED_MAX:
+            return tempfile.SpooledTemporaryFile(max_size=SPOOLED_MAX, mode='rb+')
+        tf = tempfile.NamedTemporaryFile(mode='rb+', prefix=UPLOAD_PREFIX, delete=False)
+        self.upload_paths.append(tf.name)
+        return tf
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+app.request_class = UploadRequest
+
+# Reject oversized uploads at the WSGI boundary, before anything is buffered
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', '2048')) * 1024 * 1024
+
+# Gzip JSON responses (job and file listings); downloads and the SSE stream
+# are left alone
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+# Small bodies are not worth compressing; level 4 keeps CPU cost per
+# polled response low while still shrinking JSON several-fold
+app.config['COMPRESS_MIN_SIZE'] = 1024
+app.config['COMPRESS_LEVEL'] = 4
+app.config['COMPRESS_BR_LEVEL'] = 4
+
+# Process pool workers import this module only to unpickle the functions
+# they run, so start-up that belongs to the server itself (compression,
+# the job reaper, pools, upload sweeping) is skipped in them
+_SERVER_PROCESS = multiprocessing.current_process().name == "MainProcess"
+
+if _SERVER_PROCESS:
+    Compress(app)
+
+# Let the front-end web server send downloaded files itself: set
+# USE_X_SENDFILE=1 behind Apache/lighttpd, or X_ACCEL_REDIRECT_PREFIX to an
+# Nginx internal location aliased to OUTPUT_ROOT behind Nginx
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX')
+
+# Seconds clients may cache downloaded files before revalidating
+DOWNLOAD_MAX_AGE = 3600
+
+# Store job status, oldest first. A stored record is never modified;
+# updates store a new dict in its place, so readers can take a record under
+# the lock and serialize it after releasing the lock without copying it
+jobs = OrderedDict()
+
+# Maximum number of jobs kept; beyond it the oldest finished jobs are evicted
+MAX_JOBS = 1024
+
+# Maximum number of messages kept in a job's log; older ones are dropped
+MAX_JOB_LOG = 200
+
+# Maximum number of per-item error messages kept in a job's record
+MAX_JOB_ERRORS = 100
+
+# Finished jobs are dropped this many seconds after they finish
+JOB_TTL_SECONDS = 24 * 60 * 60
+
+# Seconds between runs of the job reaper thread
+JOB_REAP_INTERVAL_SECONDS = 10 * 60
+
+# Statuses of jobs that have not finished yet
+ACTIVE_STATUSES = ("queued", "running")
+
+# Guards jobs against concurrent writes from the background workers and
+# reads from the request handlers; only dict operations happen under it
+_jobs_lock = threading.Lock()
+
+# Notified on every job update so progress streams can push changes;
+# _job_versions counts the updates seen by each job
+_jobs_changed = threading.Condition(_jobs_lock)
+_job_versions = {}
+
+# Bumped on any change to the registry; the full /api/jobs body is cached
+# as (generation, bytes) and reused until the generation moves on
+_jobs_generation = 0
+_jobs_body_cache = None
+
+# Only directories below this one can be listed or downloaded from through
+# the files API; relative output directories resolve under it when the
+# server runs from it (the default)
+OUTPUT_ROOT = os.path.realpath(os.environ.get('OUTPUT_ROOT', os.getcwd()))
+
+# Directory listings are cached for directories with at most this many
+# entries; larger ones are streamed from the directory on every request.
+# At most LISTING_CACHE_MAX_DIRS listings are kept, least recently used first
+# out, and a listing is not reused while the directory was modified less
+# than LISTING_SETTLE_SECONDS before it was taken, since files created within
+# the same timestamp tick leave the mtime unchanged
+LISTING_CACHE_MAX_ENTRIES = 10000
+LISTING_CACHE_MAX_DIRS = 256
+LISTING_SETTLE_SECONDS = 1
+_listing_cache = OrderedDict()
+_listing_lock = threading.Lock()
+
+# Seconds between heartbeat comments on an idle progress stream
+SSE_HEARTBEAT_SECONDS = 15
+
+# Longest a status request with ?wait= is held open waiting for a change
+MAX_JOB_WAIT_SECONDS = 30
+
+def _client_has_etag(etag):
+    """
+    Check whether the current request's If-None-Match names an ETag.
+    
+    flask-compress sends compressed bodies with the ETag suffixed by
+    ":<encoding>" (e.g. "abc:gzip"), and clients send that form back, so
+    the suffix is ignored when comparing.
+    
+    Args:
+        etag (str): The unquoted ETag of the uncompressed response
+    
+    Returns:
+        bool: True if the client already holds a response with this ETag
+    """
+    if_none_match = request.if_none_match
+    return if_none_match.star_tag or any(tag.split(':', 1)[0] == etag for tag in if_none_match)
+
+def _touch_job(job_id):
+    """
+    Bump a job's version and wake up its progress streams. Must be called
+    with the jobs lock held.
+    
+    Args:
+        job_id (str): ID of the job that changed
+    """
+    global _jobs_generation
+    _job_versions[job_id] = _job_versions.get(job_id, 0) + 1
+    _jobs_generation += 1
+    _jobs_changed.notify_all()
+
+def _forget_job(job_id):
+    """
+    Remove a finished job from the registry. Must be called with the jobs
+    lock held.
+    
+    Args:
+        job_id (str): ID of the job to remove
+    """
+    global _jobs_generation
+    del jobs[job_id]
+    _job_versions.pop(job_id, None)
+    _jobs_generation += 1
+
+def _record_job(job_id, job):
+    """
+    Register a new job, evicting the oldest finished jobs once the registry
+    holds more than MAX_JOBS entries.
+    
+    Args:
+        job_id (str): ID of the new job
+        job (dict): Initial job record
+    """
+    global _jobs_generation
+    with _jobs_lock:
+        jobs[job_id] = job
+        jobs.move_to_end(job_id)
+        _jobs_generation += 1
+        
+        excess = len(jobs) - MAX_JOBS
+        if excess > 0:
+            finished = (jid for jid, j in jobs.items() if j["status"] not in ACTIVE_STATUSES)
+            for jid in list(itertools.islice(finished, excess)):
+                _forget_job(jid)
+
+def _reap_jobs():
+    """
+    Periodically drop jobs that finished more than JOB_TTL_SECONDS ago.
+    Runs forever in a daemon thread.
+    """
+    while True:
+        time.sleep(JOB_REAP_INTERVAL_SECONDS)
+        cutoff = time.time() - JOB_TTL_SECONDS
+        with _jobs_lock:
+            expired = [jid for jid, j in jobs.items() if j.get("finished_at", cutoff) < cutoff]
+            for jid in expired:
+                _forget_job(jid)
+
+if _SERVER_PROCESS:
+    threading.Thread(target=_reap_jobs, name="job-reaper", daemon=True).start()
+
+def _update_job(job_id, **fields):
+    """
+    Set fields on a job record under the jobs lock. When a job finishes it
+    is stamped with finished_at.
+    
+    Args:
+        job_id (str): ID of the job to update
+        **fields: Fields to set on the job record
+    """
+    with _jobs_lock:
+        job = jobs.get(job_id)
+        if job is None:
+            # Already evicted from the registry
+            return
+        job = {**job, **fields}
+        if "status" in fields and fields["status"] not in ACTIVE_STATUSES:
+            job.setdefault("finished_at", time.time())
+        jobs[job_id] = job
+        _touch_job(job_id)
+
+def _log_job(job_id, message):
+    """
+    Append a message to a job's log under the jobs lock.
+    
+    Args:
+        job_id (str): ID of the job to update
+        message (str): Log message
+    """
+    with _jobs_lock:
+        job = jobs.get(job_id)
+        if job is not None:
+            log = job["log"][-(MAX_JOB_LOG - 1):] + [message]
+            jobs[job_id] = {**job, "log": log}
+            _touch_job(job_id)
+
+def _job_events(job_id):
+    """
+    Generate Server-Sent Events with a job's record each time it changes,
+    until the job leaves the queued/running states.
+    
+    Args:
+        job_id (str): ID of the job to follow
+    
+    Yields:
+        str: SSE messages, or heartbeat comments while the job is idle
+    """
+    # Sentinel so the current state is sent straight away
+    last_version = object()
+    while True:
+        with _jobs_changed:
+            changed = _jobs_changed.wait_for(
+                lambda: _job_versions.get(job_id) != last_version,
+                timeout=SSE_HEARTBEAT_SECONDS
+            )
+            last_version = _job_versions.get(job_id)
+            job = jobs.get(job_id)
+        
+        if not changed:
+            # Keep proxies from closing the idle connection
+            yield ":heartbeat\n\n"
+            continue
+        
+        if job is None:
+            yield f"event: error\ndata: {orjson.dumps({'error': 'Job not found'}, option=ORJSON_OPTIONS).decode()}\n\n"
+            return
+        
+        yield f"data: {orjson.dumps(job, option=ORJSON_OPTIONS).decode()}\n\n"
+        if job["status"] not in ("queued", "running"):
+            return
+
+# Process pool for the CPU-bound work (parquet/CISI conversion, wikir and
+# WW2 PDF rendering and token analysis), so concurrent jobs run in parallel
+# instead of contending for the GIL. Workers are started from a fork server
+# (or spawned where there is none) rather than forked from this process,
+# whose request, job and reaper threads may hold locks at fork time
+_MP_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+_process_pool_executor = None
+_process_pool_lock = threading.Lock()
+
+def _process_pool(broken=None):
+    """
+    Return the process pool, creating it on first use.
+    
+    A worker that dies (OOM kill, segfault in a native library) breaks the
+    whole pool; passing the broken pool replaces it with a fresh one, unless
+    another thread has already done so.
+    
+    Args:
+        broken (ProcessPoolExecutor, optional): Pool that raised BrokenProcessPool
+        
+    Returns:
+        ProcessPoolExecutor: The current pool
+    """
+    global _process_pool_executor
+    with _process_pool_lock:
+        if _process_pool_executor is None or _process_pool_executor is broken:
+            if broken is not None:
+                broken.shutdown(wait=False)
+            _process_pool_executor = ProcessPoolExecutor(
+                max_workers=os.cpu_count(), mp_context=multiprocessing.get_context(_MP_START_METHOD)
+            )
+        return _process_pool_executor
+
+def _pool_submit(fn, *args, **kwargs):
+    """
+    Submit a call to the process pool, rebuilding the pool once if it broke.
+    
+    Only calls that never started are resubmitted; calls already running when
+    a worker died fail with BrokenProcessPool through their futures.
+    
+    Returns:
+        Future: Future of the call
+    """
+    pool = _process_pool()
+    try:
+        return pool.submit(fn, *args, **kwargs)
+    except BrokenProcessPool:
+        return _process_pool(broken=pool).submit(fn, *args, **kwargs)
+
+def _pool_map(fn, iterable, chunksize=1):
+    """
+    Map a function over the process pool, rebuilding the pool once if it
+    was already broken. Results are yielded in input order.
+    """
+    items = list(iterable)
+    pool = _process_pool()
+    try:
+        return pool.map(fn, items, chunksize=chunksize)
+    except BrokenProcessPool:
+        return _process_pool(broken=pool).map(fn, items, chunksize=chunksize)
+
+if _SERVER_PROCESS:
+    # Bounded thread pool for the I/O-heavy dataset and Wikipedia jobs; jobs
+    # wait in its queue under load instead of each spawning a new thread
+    JOB_POOL = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 2), thread_name_prefix="job")
+    atexit.register(JOB_POOL.shutdown, wait=False)
+
+# Output directories already created by this process
+_created_dirs = set()
+_dirs_lock = threading.Lock()
+
+def _ensure_dir(path):
+    """
+    Create a directory once per process; later calls for the same path
+    skip the makedirs syscalls.
+    
+    Args:
+        path (str): Directory to create
+    
+    Raises:
+        OSError: If the directory cannot be created
+    """
+    with _dirs_lock:
+        if path not in _created_dirs:
+            os.makedirs(path, exist_ok=True)
+            _created_dirs.add(path)
+
+# Uploaded files are named with this prefix so leftovers can be found later
+UPLOAD_PREFIX = "pqx-"
+
+# Uploads older than this are assumed to belong to a crashed server
+STALE_UPLOAD_SECONDS = 24 * 60 * 60
+
+# Uploaded files still owned by a pending job, keyed by job ID
+_job_uploads = {}
+
+def _remove_file(path):
+    """
+    Delete a file, ignoring errors if it is already gone.
+    
+    Args:
+        path (str): Path of the file to delete
+    """
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+UPLOAD_COPY_BUFFER = 4 * 1024 * 1024
+
+def _copy_upload(src, dst):
+    """
+    Copy an upload stream into an open file, in the kernel when possible.
+    
+    Uploads still held in memory are written straight from their buffer.
+    Uploads that rolled over to disk are copied with os.sendfile, falling
+    back to a buffered copy on platforms without it. Calling fileno() on a
+    SpooledTemporaryFile forces it to disk, so it is only called once the
+    spool is known to have rolled over.
+    
+    Args:
+        src: The upload stream (usually a SpooledTemporaryFile)
+        dst: The destination file object, opened for binary writing
+    """
+    buffer = getattr(src, '_file', None)
+    if isinstance(buffer, io.BytesIO):
+        with buffer.getbuffer() as view:
+            dst.write(view)
+        return
+    if buffer is not None:
+        src = buffer
+    try:
+        # Push out anything still in the Python-level write buffer, since
+        # sendfile reads what is on disk
+        src.flush()
+        src_fd = src.fileno()
+        size = os.fstat(src_fd).st_size
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(dst.fileno(), src_fd, offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+        return
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        pass
+    # Start over in case sendfile wrote part of the file before failing
+    src.seek(0)
+    dst.seek(0)
+    dst.truncate()
+    shutil.copyfileobj(src, dst, length=UPLOAD_COPY_BUFFER)
+
+def _save_upload(file, job_id):
+    """
+    Stream an uploaded file into a named temporary file in a single pass,
+    or take over the file the upload was already written to.
+    
+    The file is registered under the job ID and removed by _release_upload
+    when the job finishes, or at interpreter exit if it never does.
+    
+    Args:
+        file (FileStorage): The uploaded file
+        job_id (str): ID of the job that owns the upload
+    
+    Returns:
+        str: Path to the temporary file
+    """
+    # Large uploads already sit in a named file; take it over under a
+    # job-specific name instead of copying it
+    stream = file.stream
+    if getattr(stream, 'name', None) in request.upload_paths:
+        stream.flush()
+        path = os.path.join(os.path.dirname(stream.name),
+                            f"{UPLOAD_PREFIX}{job_id}{Path(file.filename).suffix}")
+        os.rename(stream.name, path)
+        request.upload_paths.remove(stream.name)
+        with _jobs_lock:
+            _job_uploads[job_id] = path
+        return path
+    
+    with tempfile.NamedTemporaryFile(delete=False, prefix=f"{UPLOAD_PREFIX}{job_id}-",
+                                     suffix=Path(file.filename).suffix) as tf:
+        with _jobs_lock:
+            _job_uploads[job_id] = tf.name
+        try:
+            _copy_upload(file.stream, tf)
+        except Exception:
+            _release_upload(job_id)
+            raise
+    return tf.name
+
+def _release_upload(job_id):
+    """
+    Remove the uploaded file owned by a job, if any.
+    
+    Args:
+        job_id (str): ID of the job that owns the upload
+    """
+    with _jobs_lock:
+        path = _job_uploads.pop(job_id, None)
+    if path:
+        _remove_file(path)
 
-# Store job status
-jobs = {}
+@atexit.register
+def _cleanup_uploads():
+    """
+    Remove uploads of jobs that were still pending when the server exited.
+    """
+    with _jobs_lock:
+        paths = list(_job_uploads.values())
+        _job_uploads.clear()
+    for path in paths:
+        _remove_file(path)
+
+def _sweep_stale_uploads():
+    """
+    Remove uploads left behind by a previous server process that crashed
+    before its jobs could clean up.
+    """
+    cutoff = time.time() - STALE_UPLOAD_SECONDS
+    for path in glob.glob(os.path.join(tempfile.gettempdir(), f"{UPLOAD_PREFIX}*")):
+        with _jobs_lock:
+            if path in _job_uploads.values():
+                continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.unlink(path)
+        except OSError:
+            pass
+
+if _SERVER_PROCESS:
+    _sweep_stale_uploads()
+
+def _run_job(runner, file_path, output_dir, **kwargs):
+    """
+    Run a conversion function in a worker process.
+    
+    Args:
+        runner (callable): extract_papers or convert_cisi_to_markdown
+        file_path (str): Path to the uploaded input file
+        output_dir (str): Directory to save the markdown files
+        **kwargs: Extra keyword arguments for the runner
+    
+    Returns:
+        tuple: (result, error), where result holds the fields to record on
+            the job (file_count, elapsed_s) and error is None on success
+    """
+    try:
+        start = time.perf_counter()
+        # The runner reports how many files it wrote, so there is no need
+        # to list the output directory afterwards
+        file_count = runner(file_path, output_dir, **kwargs)
+        elapsed = time.perf_counter() - start
+        return {"file_count": file_count, "elapsed_s": round(elapsed, 3)}, None
+    except Exception as e:
+        return None, str(e)
+
+def _finalize_job(job_id, future):
+    """
+    Record the outcome of a pooled job and remove its uploaded file.
+    
+    Args:
+        job_id (str): ID of the job to update
+        future (Future): Completed future returned by _pool_submit
+    """
+    try:
+        result, error = future.result()
+    except Exception as e:
+        # The worker process died before returning a result
+        result, error = None, str(e)
+    
+    # Update job status
+    if error is None:
+        _update_job(job_id, status="completed", **result)
+    else:
+        _update_job(job_id, status="failed", error=error)
+    
+    # Clean up the uploaded file
+    _release_upload(job_id)
+
+# Number of entries serialized per chunk of a streamed listing
+STREAM_BATCH_SIZE = 1000
+
+def _parse_page_args():
+    """
+    Read the optional offset/limit pagination parameters from the query string.
+    
+    Returns:
+        tuple: (start, stop) bounds for itertools.islice, stop is None when unlimited
+    
+    Raises:
+        ValueError: If either parameter is not a non-negative integer
+    """
+    offset = int(request.args.get('offset', 0))
+    limit = request.args.get('limit')
+    limit = int(limit) if limit is not None else None
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("offset and limit must be non-negative")
+    return offset, (offset + limit if limit is not None else None)
+
+def _json_batches(items):
+    """
+    Serialize items in batches of STREAM_BATCH_SIZE as comma-separated JSON
+    fragments, for splicing into a streamed JSON array.
+    
+    Args:
+        items (iterable): JSON-serializable values
+    
+    Yields:
+        tuple: (fragment, count) - the serialized batch, prefixed with a comma
+            after the first one, and the number of items in it
+    """
+    first = True
+    while True:
+        batch = list(itertools.islice(items, STREAM_BATCH_SIZE))
+        if not batch:
+            return
+        # Strip the surrounding brackets to get the comma-joined elements
+        fragment = orjson.dumps(batch, option=ORJSON_OPTIONS)[1:-1]
+        yield (fragment if first else b',' + fragment), len(batch)
+        first = False
+
+def _resolve_output_dir(output_dir):
+    """
+    Resolve an output directory requested through the files API.
+    
+    The check only looks at where the directory is, not at which jobs
+    wrote it, so it works the same after a restart and for output
+    written by the command line tool.
+    
+    Args:
+        output_dir (str): Directory given by the client
+    
+    Returns:
+        str: The real path of the directory, or None if it does not exist
+            or is not strictly below OUTPUT_ROOT
+    """
+    if not output_dir:
+        return None
+    real_dir = os.path.realpath(output_dir)
+    try:
+        inside = real_dir != OUTPUT_ROOT and os.path.commonpath([OUTPUT_ROOT, real_dir]) == OUTPUT_ROOT
+    except ValueError:
+        # On a different drive than OUTPUT_ROOT (Windows)
+        inside = False
+    return real_dir if inside and os.path.isdir(real_dir) else None
+
+def _cached_listing(directory):
+    """
+    Return the file names in a directory, reusing the previous listing when
+    the directory has not changed since.
+    
+    Args:
+        directory (str): Directory to list
+    
+    Returns:
+        list: File names, or None if the directory is too large to cache
+    """
+    st = os.stat(directory)
+    key = (st.st_mtime_ns, st.st_size, st.st_nlink)
+    with _listing_lock:
+        cached = _listing_cache.get(directory)
+        if cached and cached[0] == key:
+            _listing_cache.move_to_end(directory)
+            return cached[1]
+    
+    scanned_at = time.time_ns()
+    with os.scandir(directory) as it:
+        names = list(itertools.islice((entry.name for entry in it), LISTING_CACHE_MAX_ENTRIES + 1))
+    if len(names) > LISTING_CACHE_MAX_ENTRIES:
+        names = None
+    
+    with _listing_lock:
+        if scanned_at - st.st_mtime_ns < LISTING_SETTLE_SECONDS * 1_000_000_000:
+            # Still being written to (e.g. by a running job)
+            _listing_cache.pop(directory, None)
+        else:
+            _listing_cache[directory] = (key, names)
+            _listing_cache.move_to_end(directory)
+            while len(_listing_cache) > LISTING_CACHE_MAX_DIRS:
+                _listing_cache.popitem(last=False)
+    return names
+
+# Upper bounds for the parquet extraction parameters
+MAX_PAPERS = int(os.environ.get("MAX_PAPERS", 1_000_000))
+MAX_SEED = 2**32 - 1
+
+def _form_int(name, default, minimum, maximum):
+    """
+    Read an integer form field and check that it lies within bounds.
+    
+    Args:
+        name (str): Name of the form field
+        default (int): Value used when the field is missing
+        minimum (int): Smallest accepted value
+        maximum (int): Largest accepted value
+    
+    Returns:
+        int: The parsed value
+    
+    Raises:
+        ValueError: With a message for the client if the value is invalid
+    """
+    value = request.form.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+    if not minimum <= value <= maximum:
+        raise ValueError(f"{name} must be between {minimum} and {maximum}")
+    return value
+
+@app.teardown_request
+def _remove_unclaimed_uploads(exc):
+    # Uploads written to named files by UploadRequest that no job took over
+    for path in request.upload_paths:
+        _remove_file(path)
+
+@app.errorhandler(413)
+def upload_too_large(error):
+    return jsonify({"error": "File too large"}), 413
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "ok"})
 
+def _all_jobs_body():
+    """
+    Return the JSON body listing every job, encoding it again only when the
+    registry has changed since the last call.
+    
+    Returns:
+        bytes: The encoded jobs object
+    """
+    global _jobs_body_cache
+    with _jobs_lock:
+        generation = _jobs_generation
+        if _jobs_body_cache is not None and _jobs_body_cache[0] == generation:
+            return _jobs_body_cache[1]
+        snapshot = dict(jobs)
+    
+    body = orjson.dumps(snapshot, option=ORJSON_OPTIONS)
+    with _jobs_lock:
+        _jobs_body_cache = (generation, body)
+    return body
+
 @app.route('/api/jobs', methods=['GET'])
 def list_jobs():
-    return jsonify(jobs)
+    try:
+        start, stop = _parse_page_args()
+    except ValueError:
+        return jsonify({"error": "offset and limit must be non-negative integers"}), 400
+    
+    # Clients polling the full listing get the cached body while no job
+    # has changed
+    if start == 0 and stop is None:
+        return Response(_all_jobs_body(), mimetype='application/json')
+    
+    # Snapshot the requested page under the lock, serialize outside it
+    with _jobs_lock:
+        snapshot = list(itertools.islice(jobs.items(), start, stop))
+    
+    def generate():
+        yield b'{'
+        for i in range(0, len(snapshot), STREAM_BATCH_SIZE):
+            fragment = orjson.dumps(dict(snapshot[i:i + STREAM_BATCH_SIZE]), option=ORJSON_OPTIONS)[1:-1]
+            yield fragment if i == 0 else b',' + fragment
+        yield b'}'
+    
+    return Response(generate(), mimetype='application/json')
 
 @app.route('/api/jobs/<job_id>', methods=['GET'])
 def get_job_status(job_id):
-    if job_id not in jobs:
-        return jsonify({"error": "Job not found"}), 404
-    return jsonify(jobs[job_id])
-
-@app.route('/api/extract/parquet', methods=['POST'])
-def extract_parquet():
-    # Check if file was uploaded
-    if 'file' not in request.files:
-        return jsonify({"error": "No file uploaded"}), 400
-    
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({"error": "No file selected"}), 400
+    try:
+        wait = min(int(request.args.get('wait', 0)), MAX_JOB_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({"error": "wait must be an integer"}), 400
     
-    # Get parameters
-    output_dir = request.form.get('output_dir', 'extracted_papers')
-    num_papers = int(request.form.get('num_papers', 1000))
-    seed = int(request.form.get('seed', 42))
+    with _jobs_lock:
+        job = jobs.get(job_id)
+        version = _job_versions.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
     
-    # Create a temporary directory to store the uploaded file
-    temp_dir = tempfile.mkdtemp()
-    temp_file_path = os.path.join(temp_dir, file.filename)
+    response = jsonify(job)
+    response.add_etag()
     
-    # Save the uploaded file
-    file.save(temp_file_path)
+    # Long poll: a client that already has this state of an active job is
+    # held until the job changes or the wait runs out
+    if wait > 0 and job["status"] in ACTIVE_STATUSES and _client_has_etag(response.get_etag()[0]):
+        with _jobs_changed:
+            _jobs_changed.wait_for(lambda: _job_versions.get(job_id) != version, timeout=wait)
+            job = jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        response = jsonify(job)
+        response.add_etag()
     
-    # Generate a job ID
-    job_id = str(uuid.uuid4())
+    # Pollers that send back the ETag of an unchanged job get a bodiless 304
+    return response.make_conditional(request)
+
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+def stream_job_status(job_id):
+    with _jobs_lock:
+        known = job_id in jobs
+    if not known:
+        return jsonify({"error": "Job not found"}), 404
     
-    # Set initial job status
-    jobs[job_id] = {
-        "id": job_id,
-        "status": "running",
-        "type": "parquet",
-        "file": file.filename,
-        "output_dir": output_dir,
-        "num_papers": num_papers,
-        "seed": seed
-    }
+    return Response(
+        _job_events(job_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _submit_job(kind, runner, output_dir, **params):
+    """
+    Save the uploaded file and run a conversion on it in the process pool.
     
-    # Start the extraction in a background thread
-    def process_file():
-        try:
-            # Create output directory
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Extract papers
-            extract_papers(temp_file_path, output_dir, num_papers, seed)
-            
-            # Update job status
-            jobs[job_id]["status"] = "completed"
-            jobs[job_id]["file_count"] = len(os.listdir(output_dir))
-        except Exception as e:
-            jobs[job_id]["status"] = "failed"
-            jobs[job_id]["error"] = str(e)
-        finally:
-            # Clean up temporary directory
-            shutil.rmtree(temp_dir)
+    Shared by the upload endpoints so that they go through the same
+    validation, upload handling and job bookkeeping.
     
-    # Start the processing thread
-    thread = threading.Thread(target=process_file)
-    thread.start()
+    Args:
+        kind (str): Job type recorded in the job status (e.g. "parquet")
+        runner (callable): extract_papers or convert_cisi_to_markdown
+        output_dir (str): Directory to save the markdown files
+        **params: Extra keyword arguments for the runner, also recorded
+            in the job status
     
-    return jsonify({
-        "job_id": job_id,
-        "status": "running",
-        "message": f"Processing {file.filename} in the background"
-    })
-
-@app.route('/api/extract/cisi', methods=['POST'])
-def extract_cisi():
+    Returns:
+        tuple: (response, status_code)
+    """
     # Check if file was uploaded
     if 'file' not in request.files:
         return jsonify({"error": "No file uploaded"}), 400
@@ -113,87 +863,369 @@ def extract_cisi():
     if file.filename == '':
         return jsonify({"error": "No file selected"}), 400
     
-    # Get parameters
-    output_dir = request.form.get('output_dir', 'cisi_papers')
-    
-    # Create a temporary directory to store the uploaded file
-    temp_dir = tempfile.mkdtemp()
-    temp_file_path = os.path.join(temp_dir, file.filename)
-    
-    # Save the uploaded file
-    file.save(temp_file_path)
+    # Create the output directory up front so failures are reported here
+    # rather than inside the background job
+    try:
+        _ensure_dir(output_dir)
+    except OSError as e:
+        return jsonify({"error": f"Could not create output directory '{output_dir}': {e}"}), 500
     
     # Generate a job ID
     job_id = str(uuid.uuid4())
     
+    # Save the uploaded file
+    temp_file_path = _save_upload(file, job_id)
+    
     # Set initial job status
-    jobs[job_id] = {
+    _record_job(job_id, {
         "id": job_id,
         "status": "running",
-        "type": "cisi",
+        "type": kind,
         "file": file.filename,
-        "output_dir": output_dir
-    }
-    
-    # Start the conversion in a background thread
-    def process_file():
-        try:
-            # Create output directory
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Convert CISI to markdown
-            convert_cisi_to_markdown(temp_file_path, output_dir)
-            
-            # Update job status
-            jobs[job_id]["status"] = "completed"
-            jobs[job_id]["file_count"] = len(os.listdir(output_dir))
-        except Exception as e:
-            jobs[job_id]["status"] = "failed"
-            jobs[job_id]["error"] = str(e)
-        finally:
-            # Clean up temporary directory
-            shutil.rmtree(temp_dir)
+        "output_dir": output_dir,
+        **params
+    })
     
-    # Start the processing thread
-    thread = threading.Thread(target=process_file)
-    thread.start()
+    # Run the conversion in the process pool
+    try:
+        future = _pool_submit(_run_job, runner, temp_file_path, output_dir, **params)
+    except Exception as e:
+        _release_upload(job_id)
+        _update_job(job_id, status="failed", error=str(e))
+        return jsonify({"error": str(e)}), 500
+    future.add_done_callback(lambda f: _finalize_job(job_id, f))
     
     return jsonify({
         "job_id": job_id,
         "status": "running",
         "message": f"Processing {file.filename} in the background"
-    })
+    }), 200
+
+@app.route('/api/extract/parquet', methods=['POST'])
+def extract_parquet():
+    # Reject out-of-range values before any work is queued
+    try:
+        num_papers = _form_int('num_papers', 1000, 1, MAX_PAPERS)
+        seed = _form_int('seed', 42, 0, MAX_SEED)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    output_dir = request.form.get('output_dir', 'extracted_papers')
+    return _submit_job('parquet', extract_papers, output_dir, num_papers=num_papers, seed=seed)
+
+@app.route('/api/extract/cisi', methods=['POST'])
+def extract_cisi():
+    output_dir = request.form.get('output_dir', 'cisi_papers')
+    return _submit_job('cisi', convert_cisi_to_markdown, output_dir)
 
 @app.route('/api/files', methods=['GET'])
 def list_files():
     output_dir = request.args.get('output_dir', '')
     
-    if not output_dir or not os.path.exists(output_dir):
+    real_dir = _resolve_output_dir(output_dir)
+    if real_dir is None:
         return jsonify({"error": f"Directory '{output_dir}' not found"}), 404
     
-    files = os.listdir(output_dir)
-    return jsonify({
-        "output_dir": output_dir,
-        "file_count": len(files),
-        "files": files
-    })
+    try:
+        start, stop = _parse_page_args()
+        names = _cached_listing(real_dir)
+    except ValueError:
+        return jsonify({"error": "offset and limit must be non-negative integers"}), 400
+    except FileNotFoundError:
+        return jsonify({"error": f"Directory '{output_dir}' not found"}), 404
+    
+    # Large directories are streamed straight from the directory scan
+    # rather than building the full list of names in memory. file_count is
+    # the number of files in the directory, page_count the number returned
+    # and next_offset the offset of the following page (null on the last)
+    def generate():
+        file_count = 0
+        page_count = 0
+        
+        def scanned(listing):
+            nonlocal file_count
+            for entry in listing:
+                file_count += 1
+                yield entry.name
+        
+        yield b'{"output_dir":' + orjson.dumps(output_dir) + b',"files":['
+        listing = os.scandir(real_dir) if names is None else None
+        try:
+            source = names if listing is None else scanned(listing)
+            for fragment, count in _json_batches(itertools.islice(source, start, stop)):
+                page_count += count
+                yield fragment
+            if listing is None:
+                file_count = len(names)
+            else:
+                # Count the entries after the page
+                for _ in source:
+                    pass
+        finally:
+            if listing is not None:
+                listing.close()
+        next_offset = start + page_count if start + page_count < file_count else None
+        yield (b'],"file_count":' + str(file_count).encode()
+               + b',"page_count":' + str(page_count).encode()
+               + b',"next_offset":' + orjson.dumps(next_offset) + b'}')
+    
+    return Response(generate(), mimetype='application/json')
 
 @app.route('/api/files/<path:filename>', methods=['GET'])
 def download_file(filename):
     output_dir = request.args.get('output_dir', '')
     
-    if not output_dir or not os.path.exists(output_dir):
+    real_dir = _resolve_output_dir(output_dir)
+    if real_dir is None:
         return jsonify({"error": f"Directory '{output_dir}' not found"}), 404
     
-    if not os.path.exists(os.path.join(output_dir, filename)):
+    if X_ACCEL_REDIRECT_PREFIX:
+        path = safe_join(real_dir, filename)
+        if path is None:
+            return jsonify({"error": f"File '{filename}' not found in '{output_dir}'"}), 404
+        
+        # Nginx streams the file from its internal location with sendfile().
+        # The header carries a URI relative to OUTPUT_ROOT, percent-encoded
+        # so spaces, '%', '?', '#' and non-latin-1 names survive
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = X_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(os.path.relpath(path, OUTPUT_ROOT))
+        return response
+    
+    # send_from_directory rejects paths escaping real_dir and missing files,
+    # so no separate existence check is needed. Conditional responses let
+    # clients with a fresh ETag get a bodiless 304
+    try:
+        return send_from_directory(real_dir, filename, conditional=True, etag=True, max_age=DOWNLOAD_MAX_AGE)
+    except NotFound:
         return jsonify({"error": f"File '{filename}' not found in '{output_dir}'"}), 404
+
+@lru_cache(maxsize=8)
+def _load_dataset(dataset_name):
+    """
+    Load an ir_datasets dataset, reusing the handle from earlier jobs on the
+    same dataset instead of setting it up again.
+    
+    Args:
+        dataset_name (str): Name of the ir-datasets dataset
+    
+    Returns:
+        Dataset: The loaded dataset
+    """
+    return ir_datasets.load(dataset_name)
+
+# Number of documents read ahead of the consumer by _prefetch
+PREFETCH_SIZE = 64
+
+def _prefetch(iterable, size=PREFETCH_SIZE):
+    """
+    Iterate over an iterable while a background thread reads ahead of the
+    consumer, so reading documents from disk overlaps with processing them.
+    
+    Exceptions raised by the iterable are re-raised in the consumer. If the
+    consumer stops early, the reader thread is stopped as well.
+    
+    Args:
+        iterable: The iterable to read from (e.g. dataset.docs_iter())
+        size (int): Maximum number of items buffered ahead of the consumer
+    
+    Yields:
+        The items of the iterable, in order
+    """
+    buffer = queue.Queue(maxsize=size)
+    done = object()
+    stop = threading.Event()
+    
+    def put(item):
+        # Give up when the consumer has gone away instead of blocking forever
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def reader():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except BaseException as e:
+            put((done, e))
+    
+    threading.Thread(target=reader, name="prefetch", daemon=True).start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+def _doc_text(doc):
+    """
+    Return the text of an ir_datasets document, or "" if it has none.
+    """
+    if hasattr(doc, 'text') and doc.text:
+        return doc.text
+    if hasattr(doc, 'body') and doc.body:
+        return doc.body
+    return ""
+
+# Public attribute names per document type, for documents without text
+_doc_attrs_cache = {}
+
+def _doc_attrs(doc):
+    """
+    Return the public attribute names of an ir_datasets document, sorted.
+    
+    ir_datasets documents are namedtuples, whose fields are fixed per type,
+    so the names are computed once per type instead of calling dir() on
+    every document. Other objects fall back to dir().
+    """
+    doc_type = type(doc)
+    attrs = _doc_attrs_cache.get(doc_type)
+    if attrs is None:
+        fields = getattr(doc_type, '_fields', None)
+        if fields is None:
+            return [attr for attr in dir(doc) if not attr.startswith('_')]
+        attrs = _doc_attrs_cache[doc_type] = sorted(f for f in fields if not f.startswith('_'))
+    return attrs
+
+# Documents sent to each worker process at a time when rendering PDFs
+PDF_CHUNKSIZE = 16
+
+class _AsciiTable(dict):
+    """
+    str.translate table that replaces non-ASCII characters.
+    
+    Entries are filled in the first time a character is looked up, so the
+    table only holds the characters actually seen instead of every code
+    point. Extra fixed mappings can be passed in as overrides.
+    """
+    def __init__(self, replacement, overrides=None):
+        super().__init__(overrides or {})
+        self.replacement = replacement
+    
+    def __missing__(self, codepoint):
+        value = codepoint if codepoint < 128 else self.replacement
+        self[codepoint] = value
+        return value
+
+# FPDF's core fonts only cover latin-1, so PDF text is reduced to ASCII
+_ASCII_SPACE = _AsciiTable(' ')
+
+# Article text: non-ASCII characters and control characters other than
+# newlines and tabs become spaces, in a single pass
+_WIKI_TEXT_TABLE = _AsciiTable(' ', {i: ' ' for i in range(32) if chr(i) not in '\n\r\t'})
+
+def _write_pdf(pdf, path):
+    """
+    Render a PDF in memory and write it to disk with a single write call,
+    instead of letting FPDF write it out in small pieces.
+    
+    Args:
+        pdf (FPDF): The finished document
+        path (str): Path of the PDF file to create or overwrite
+    """
+    data = memoryview(pdf.output())
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        # os.write may write less than asked for very large buffers
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+def _wikir_doc_to_pdf(doc_tuple, output_dir):
+    """
+    Render one wikir document to a PDF file.
+    
+    Runs in a worker process, so it only takes plain values extracted from
+    the ir_datasets document.
+    
+    Args:
+        doc_tuple (tuple): (index, doc_id, title, content) of the document
+        output_dir (str): Directory to save the PDF file
+    
+    Returns:
+        tuple: (filename, errors), where filename is None if no PDF was saved
+    """
+    i, doc_id, title, content = doc_tuple
+    errors = []
+    filename = f"wikir_{doc_id}.pdf"
+    file_path = os.path.join(output_dir, filename)
+    
+    try:
+        # Create a PDF document
+        pdf = FPDF()
+        pdf.add_page()
+        
+        # Set font and add title
+        pdf.set_font("Helvetica", "B", 16)
+        
+        # Sanitize title for PDF (FPDF has encoding limitations)
+        title = title[:80]  # Truncate long titles
+        # Characters outside latin-1 become '?', in a single codec pass
+        title = title.encode('latin-1', errors='replace').decode('latin-1')
+            
+        pdf.cell(0, 10, text=title, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        
+        # Add document ID
+        pdf.set_font("Helvetica", "I", 12)
+        pdf.cell(0, 10, text=f"Document ID: {doc_id}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        
+        # Add content
+        pdf.set_font("Helvetica", "", 12)
+        
+        # Clean the content for PDF
+        if content:
+            try:
+                content = html.unescape(content)
+            except:
+                # If unescaping fails, use as is
+                pass
+        else:
+            content = "No content available"
+        
+        try:
+            # Sanitize content for PDF
+            # FPDF has issues with non-latin1 characters, so we'll replace
+            # non-ASCII ones with '?' using the codec rather than per character.
+            # Content is limited to avoid memory issues; truncating first
+            # means only the kept characters are encoded
+            content = content[:50000].encode('ascii', errors='replace').decode('ascii')
+            
+            # Add text
+            pdf.multi_cell(0, 10, text=content, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        except Exception as text_error:
+            errors.append(f"Error adding text for doc {doc_id}: {str(text_error)}")
+            # Try with minimal content
+            pdf.multi_cell(0, 10, text="Error processing document content", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        
+        try:
+            _write_pdf(pdf, file_path)
+            print(f"Created PDF: {file_path}")
+            return filename, errors
+        except Exception as pdf_error:
+            errors.append(f"Error saving PDF for doc {doc_id}: {str(pdf_error)}")
+            
+    except Exception as doc_error:
+        errors.append(f"Error processing doc at index {i}: {str(doc_error)}")
     
-    return send_from_directory(output_dir, filename)
+    return None, errors
 
 def extract_wikir_to_pdf(output_dir, dataset_name='wikir/en1k/validation', limit=100):
     """
     Extract documents from ir-datasets wikir collection and convert them to PDF.
     
+    Documents are read in the calling thread and rendered to PDF in parallel
+    on the process pool.
+    
     Args:
         output_dir (str): Directory to save the PDF files
         dataset_name (str): Name of the ir-datasets dataset to use
@@ -216,7 +1248,7 @@ def extract_wikir_to_pdf(output_dir, dataset_name='wikir/en1k/validation', limit
     try:
         # Load the dataset
         print(f"Loading dataset {dataset_name}...")
-        dataset = ir_datasets.load(dataset_name)
+        dataset = _load_dataset(dataset_name)
         print(f"Dataset loaded successfully")
         
         # Get documents iterator
@@ -228,8 +1260,15 @@ def extract_wikir_to_pdf(output_dir, dataset_name='wikir/en1k/validation', limit
         files_created = []
         errors = []
         
-        # Process documents
-        for i, doc in enumerate(docs_iter):
+        # Documents that still need a PDF, as plain values for the workers
+        doc_tuples = []
+        
+        # Read the existing filenames once instead of checking each document
+        with os.scandir(output_dir) as entries:
+            existing = {entry.name for entry in entries}
+        
+        # Process documents, reading ahead on a background thread
+        for i, doc in enumerate(_prefetch(docs_iter)):
             # Hard limit check
             if i >= limit:
                 print(f"Reached limit of {limit} documents, stopping")
@@ -246,19 +1285,12 @@ def extract_wikir_to_pdf(output_dir, dataset_name='wikir/en1k/validation', limit
                 
                 # File already exists check
                 filename = f"wikir_{doc.doc_id}.pdf"
-                file_path = os.path.join(output_dir, filename)
-                if os.path.exists(file_path):
+                if filename in existing:
                     print(f"File {filename} already exists, skipping")
                     files_created.append(filename)
                     doc_count += 1
                     continue
                 
-                # Create a PDF document
-                pdf = FPDF()
-                pdf.add_page()
-                
-                # Set font and add title
-                pdf.set_font("Arial", "B", 16)
                 title = ""
                 if hasattr(doc, 'title') and doc.title:
                     title = doc.title
@@ -267,35 +1299,12 @@ def extract_wikir_to_pdf(output_dir, dataset_name='wikir/en1k/validation', limit
                 else:
                     title = f"Document {doc.doc_id}"
                 
-                # Sanitize title for PDF (FPDF has encoding limitations)
-                title = title[:80]  # Truncate long titles
-                try:
-                    # Try to encode with latin-1 to catch any encoding issues
-                    title.encode('latin-1')
-                except UnicodeEncodeError:
-                    # Fall back to ASCII if there are encoding issues
-                    title = ''.join(c if ord(c) < 128 else '_' for c in title)
-                    
-                pdf.cell(0, 10, txt=title, ln=True)
-                
-                # Add document ID
-                pdf.set_font("Arial", "I", 12)
-                pdf.cell(0, 10, txt=f"Document ID: {doc.doc_id}", ln=True)
-                
-                # Add content
-                pdf.set_font("Arial", "", 12)
-                
                 # Process content based on what's available in the document
-                content = ""
-                if hasattr(doc, 'text') and doc.text:
-                    content = doc.text
-                elif hasattr(doc, 'body') and doc.body:
-                    content = doc.body
-                else:
+                content = _doc_text(doc)
+                if not content:
                     # List all available attributes for debugging
-                    attrs = [attr for attr in dir(doc) if not attr.startswith('_')]
                     content_attrs = {}
-                    for attr in attrs:
+                    for attr in _doc_attrs(doc):
                         try:
                             val = getattr(doc, attr)
                             if isinstance(val, str) and val:
@@ -308,47 +1317,20 @@ def extract_wikir_to_pdf(output_dir, dataset_name='wikir/en1k/validation', limit
                     else:
                         content = "No text content available for this document"
                 
-                # Clean the content for PDF
-                if content:
-                    try:
-                        content = html.unescape(content)
-                    except:
-                        # If unescaping fails, use as is
-                        pass
-                else:
-                    content = "No content available"
-                
-                try:
-                    # Sanitize content for PDF
-                    # FPDF has issues with non-latin1 characters, so we'll replace them
-                    content = ''.join(c if ord(c) < 128 else '_' for c in content)
-                    
-                    # Limit content to avoid memory issues
-                    content = content[:50000]
-                    
-                    # Add text
-                    pdf.multi_cell(0, 10, txt=content)
-                except Exception as text_error:
-                    errors.append(f"Error adding text for doc {doc.doc_id}: {str(text_error)}")
-                    # Try with minimal content
-                    pdf.multi_cell(0, 10, txt="Error processing document content")
-                
-                try:
-                    pdf.output(file_path)
-                    print(f"Created PDF: {file_path}")
-                    files_created.append(filename)
-                    doc_count += 1
-                except Exception as pdf_error:
-                    errors.append(f"Error saving PDF for doc {doc.doc_id}: {str(pdf_error)}")
+                doc_tuples.append((i, doc.doc_id, title, content))
                     
             except Exception as doc_error:
                 errors.append(f"Error processing doc at index {i}: {str(doc_error)}")
                 continue
-                
-            # Additional limit check
-            if doc_count >= limit:
-                print(f"Reached document count limit of {limit}")
-                break
+        
+        # Render the PDFs in parallel; results come back in document order
+        print(f"Rendering {len(doc_tuples)} PDFs on the process pool")
+        render = partial(_wikir_doc_to_pdf, output_dir=output_dir)
+        for filename, doc_errors in _pool_map(render, doc_tuples, chunksize=PDF_CHUNKSIZE):
+            errors.extend(doc_errors)
+            if filename is not None:
+                files_created.append(filename)
+                doc_count += 1
         
         if files_created:
             print(f"Successfully created {len(files_created)} PDF files in {output_dir}")
@@ -398,75 +1380,82 @@ def extract_wikir():
         except ValueError:
             return jsonify({"error": "Limit must be an integer"}), 400
     
+    # Create the output directory up front so failures are reported here
+    # rather than inside the background job
+    try:
+        _ensure_dir(output_dir)
+    except OSError as e:
+        return jsonify({"error": f"Could not create output directory '{output_dir}': {e}"}), 500
+    
     # Generate a job ID
     job_id = str(uuid.uuid4())
     
     # Set initial job status
-    jobs[job_id] = {
+    _record_job(job_id, {
         "id": job_id,
-        "status": "running",
+        "status": "queued",
         "type": "wikir",
         "dataset_name": dataset_name,
         "output_dir": output_dir,
         "limit": limit,
         "log": ["Job started", f"Using dataset: {dataset_name}", f"Output directory: {output_dir}", f"Document limit: {limit}"]
-    }
+    })
     
-    # Start the extraction in a background thread
+    # Run the extraction on the job thread pool
     def process_dataset():
+        _update_job(job_id, status="running")
         try:
             # Append to job log
-            jobs[job_id]["log"].append(f"Starting extraction from {dataset_name}")
+            _log_job(job_id, f"Starting extraction from {dataset_name}")
             
-            # Create output directory
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Extract documents
+            # Extract documents; the PDFs are rendered on the process pool
             result = extract_wikir_to_pdf(output_dir, dataset_name, limit)
             
             # Update job status
-            jobs[job_id]["status"] = result.get("status", "completed")
-            jobs[job_id]["result"] = result
-            jobs[job_id]["log"].append(f"Extraction finished with status: {result.get('status')}")
+            _update_job(job_id, status=result.get("status", "completed"), result=result)
+            _log_job(job_id, f"Extraction finished with status: {result.get('status')}")
             
             if result.get("status") == "error":
-                jobs[job_id]["error"] = result.get("message", "Unknown error")
-                jobs[job_id]["traceback"] = result.get("traceback", "")
-                jobs[job_id]["log"].append(f"Error: {result.get('message')}")
+                _update_job(
+                    job_id,
+                    error=result.get("message", "Unknown error"),
+                    traceback=result.get("traceback", "")
+                )
+                _log_job(job_id, f"Error: {result.get('message')}")
             
             if "errors" in result and result["errors"]:
-                jobs[job_id]["errors_count"] = len(result["errors"])
-                jobs[job_id]["errors"] = result["errors"][:20]  # Limit to first 20 errors
-                jobs[job_id]["log"].append(f"Encountered {len(result['errors'])} errors during processing")
-            
-            if os.path.exists(output_dir):
-                files = os.listdir(output_dir)
-                jobs[job_id]["file_count"] = len(files)
-                jobs[job_id]["log"].append(f"Found {len(files)} files in output directory")
-                
-                if not files:
-                    jobs[job_id]["log"].append("Warning: No files were created in the output directory")
-            else:
-                jobs[job_id]["file_count"] = 0
-                jobs[job_id]["log"].append("Warning: Output directory does not exist")
+                _update_job(
+                    job_id,
+                    errors_count=len(result["errors"]),
+                    errors=result["errors"][:20]  # Limit to first 20 errors
+                )
+                _log_job(job_id, f"Encountered {len(result['errors'])} errors during processing")
+            
+            # The extractor counts the PDFs it produced (or found already
+            # present), so the output directory is not listed again
+            file_count = result.get("total_files", 0)
+            _update_job(job_id, file_count=file_count)
+            _log_job(job_id, f"Found {file_count} files in output directory")
+            
+            if not file_count:
+                _log_job(job_id, "Warning: No files were created in the output directory")
             
         except Exception as e:
             import traceback
-            jobs[job_id]["status"] = "failed"
-            jobs[job_id]["error"] = str(e)
-            jobs[job_id]["traceback"] = traceback.format_exc()
-            jobs[job_id]["log"].append(f"Job failed with error: {str(e)}")
+            _update_job(job_id, status="failed", error=str(e), traceback=traceback.format_exc())
+            _log_job(job_id, f"Job failed with error: {str(e)}")
     
-    # Start the processing thread
-    thread = threading.Thread(target=process_dataset)
-    thread.start()
+    JOB_POOL.submit(process_dataset)
     
     return jsonify({
         "job_id": job_id,
-        "status": "running",
+        "status": "queued",
         "message": f"Processing wikir dataset {dataset_name} in the background (limit: {limit})"
     })
 
+# A token is a run of word characters; whitespace and punctuation separate tokens
+_TOKEN_RE = re.compile(r'\w+')
+
 def count_tokens(text):
     """
     Count the number of tokens in a text string.
@@ -480,58 +1469,120 @@ def count_tokens(text):
     """
     if not text:
         return 0
-        
-    # Replace punctuation with spaces, then split on whitespace
-    text = re.sub(r'[^\w\s]', ' ', text)
-    tokens = re.split(r'\s+', text.lower())
-    # Filter out empty tokens
-    tokens = [t for t in tokens if t]
-    return len(tokens)
+    
+    # Count matches in a single pass without building a list of tokens
+    return sum(1 for _ in _TOKEN_RE.finditer(text))
 
-def analyze_wikir_dataset(dataset_name='wikir/en1k/validation', limit=None):
+# Arrow copies of ir_datasets documents, so that full-corpus analyses read
+# a memory-mapped file instead of re-parsing the dataset
+ARROW_CACHE_DIR = os.environ.get('ARROW_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'parquet-extractor-cache', 'arrow'))
+ARROW_BATCH_SIZE = 1024
+_ARROW_SCHEMA = pa.schema([('doc_id', pa.string()), ('text', pa.string())])
+
+def _arrow_cache_path(dataset_name):
+    return os.path.join(ARROW_CACHE_DIR, dataset_name.replace('/', '__') + '.arrow')
+
+def _materialize_arrow(dataset_name):
     """
-    Analyze the wikir dataset and count tokens in all documents.
+    Return the (doc_id, text) columns of a dataset as an Arrow table.
+    
+    The first call writes the documents to an Arrow IPC file in
+    ARROW_CACHE_DIR; later calls memory-map that file.
     
     Args:
-        dataset_name (str): Name of the ir-datasets dataset to analyze
-        limit (int): Maximum number of documents to analyze (None for all)
+        dataset_name (str): Name of the ir-datasets dataset
     
     Returns:
-        dict: Analysis results
+        pyarrow.Table: Table with doc_id and text columns
     """
-    try:
+    path = _arrow_cache_path(dataset_name)
+    if not os.path.exists(path):
+        print(f"Writing Arrow copy of {dataset_name} to {path}")
+        _ensure_dir(ARROW_CACHE_DIR)
+        # Write to a temporary name so a partial file is never picked up
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            docs = _prefetch(_load_dataset(dataset_name).docs_iter())
+            with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, _ARROW_SCHEMA) as writer:
+                while batch := list(itertools.islice(docs, ARROW_BATCH_SIZE)):
+                    writer.write_batch(pa.record_batch(
+                        [[doc.doc_id for doc in batch], [_doc_text(doc) for doc in batch]],
+                        schema=_ARROW_SCHEMA
+                    ))
+            os.replace(tmp_path, path)
+        except BaseException:
+            _remove_file(tmp_path)
+            raise
+    return pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+def _iter_doc_texts(dataset_name, limit):
+    """
+    Iterate over the texts of a dataset's documents, in corpus order.
+    
+    Full-corpus runs, and any run once an Arrow copy exists, read the Arrow
+    copy in batches; limited runs without one iterate the dataset directly
+    rather than converting the whole corpus.
+    
+    Args:
+        dataset_name (str): Name of the ir-datasets dataset
+        limit (int): Maximum number of documents wanted (None for all)
+    
+    Yields:
+        str: Document text ("" for documents without text)
+    """
+    if limit is None or os.path.exists(_arrow_cache_path(dataset_name)):
+        table = _materialize_arrow(dataset_name)
+        print(f"Reading {table.num_rows} documents from the Arrow copy")
+        for batch in table.to_batches(max_chunksize=ARROW_BATCH_SIZE):
+            for text in batch.column('text').to_pylist():
+                yield text or ""
+    else:
         # Load the dataset
         print(f"Loading dataset {dataset_name}...")
-        dataset = ir_datasets.load(dataset_name)
+        dataset = _load_dataset(dataset_name)
         print(f"Dataset loaded successfully")
         
         # Get documents iterator
         docs_iter = dataset.docs_iter()
         print(f"Successfully got docs_iter()")
         
-        # Initialize counters
+        # Read ahead on a background thread
+        for doc in _prefetch(docs_iter):
+            yield _doc_text(doc)
+
+def analyze_wikir_dataset(dataset_name='wikir/en1k/validation', limit=None):
+    """
+    Analyze the wikir dataset and count tokens in all documents.
+    
+    Args:
+        dataset_name (str): Name of the ir-datasets dataset to analyze
+        limit (int): Maximum number of documents to analyze (None for all)
+    
+    Returns:
+        dict: Analysis results
+    """
+    try:
+        # Initialize counters; min and max are kept as running values
+        # rather than storing a count per document
         doc_count = 0
         total_tokens = 0
-        token_counts = []
+        min_tokens = None
+        max_tokens = 0
         errors = []
         
         # Process documents
-        for i, doc in enumerate(docs_iter):
+        for i, content in enumerate(_iter_doc_texts(dataset_name, limit)):
             try:
                 if i % 100 == 0:
                     print(f"Processing document {i}...")
                 
-                # Get document text content
-                content = ""
-                if hasattr(doc, 'text') and doc.text:
-                    content = doc.text
-                elif hasattr(doc, 'body') and doc.body:
-                    content = doc.body
-                
                 # Count tokens
                 tokens = count_tokens(content)
-                token_counts.append(tokens)
                 total_tokens += tokens
+                if min_tokens is None or tokens < min_tokens:
+                    min_tokens = tokens
+                if tokens > max_tokens:
+                    max_tokens = tokens
                 
                 doc_count += 1
                 
@@ -548,9 +1599,9 @@ def analyze_wikir_dataset(dataset_name='wikir/en1k/validation', limit=None):
         # Calculate statistics
         avg_tokens = total_tokens / doc_count if doc_count > 0 else 0
         
-        # Find min and max token counts
-        min_tokens = min(token_counts) if token_counts else 0
-        max_tokens = max(token_counts) if token_counts else 0
+        # No documents means no minimum
+        if min_tokens is None:
+            min_tokens = 0
         
         # Create result dictionary
         result = {
@@ -595,55 +1646,162 @@ def analyze_wikir():
     job_id = str(uuid.uuid4())
     
     # Set initial job status
-    jobs[job_id] = {
+    _record_job(job_id, {
         "id": job_id,
-        "status": "running",
+        "status": "queued",
         "type": "wikir_analysis",
         "dataset_name": dataset_name,
         "limit": limit,
         "log": ["Job started", f"Analyzing dataset: {dataset_name}", f"Document limit: {limit if limit else 'None (all documents)'}"]
-    }
+    })
     
-    # Start the analysis in a background thread
+    # Run the analysis on the job thread pool
     def process_analysis():
+        _update_job(job_id, status="running")
         try:
             # Append to job log
-            jobs[job_id]["log"].append(f"Starting analysis of {dataset_name}")
+            _log_job(job_id, f"Starting analysis of {dataset_name}")
             
-            # Analyze dataset
-            result = analyze_wikir_dataset(dataset_name, limit)
+            # Analyze dataset in the process pool so tokenization does not
+            # hold the GIL of the API process
+            result = _pool_submit(analyze_wikir_dataset, dataset_name, limit).result()
             
             # Update job status
             if "status" in result and result["status"] == "error":
-                jobs[job_id]["status"] = "failed"
-                jobs[job_id]["error"] = result.get("message", "Unknown error")
+                _update_job(job_id, status="failed", error=result.get("message", "Unknown error"))
                 if "traceback" in result:
-                    jobs[job_id]["traceback"] = result["traceback"]
-                jobs[job_id]["log"].append(f"Analysis failed: {result.get('message')}")
+                    _update_job(job_id, traceback=result["traceback"])
+                _log_job(job_id, f"Analysis failed: {result.get('message')}")
             else:
-                jobs[job_id]["status"] = "completed"
-                jobs[job_id]["result"] = result
-                jobs[job_id]["log"].append(f"Analysis completed successfully")
-                jobs[job_id]["log"].append(f"Found {result['document_count']} documents with {result['total_tokens']} total tokens")
-                jobs[job_id]["log"].append(f"Average tokens per document: {result['average_tokens_per_doc']:.2f}")
+                _update_job(job_id, status="completed", result=result)
+                _log_job(job_id, f"Analysis completed successfully")
+                _log_job(job_id, f"Found {result['document_count']} documents with {result['total_tokens']} total tokens")
+                _log_job(job_id, f"Average tokens per document: {result['average_tokens_per_doc']:.2f}")
             
         except Exception as e:
             import traceback
-            jobs[job_id]["status"] = "failed"
-            jobs[job_id]["error"] = str(e)
-            jobs[job_id]["traceback"] = traceback.format_exc()
-            jobs[job_id]["log"].append(f"Job failed with error: {str(e)}")
+            _update_job(job_id, status="failed", error=str(e), traceback=traceback.format_exc())
+            _log_job(job_id, f"Job failed with error: {str(e)}")
     
-    # Start the processing thread
-    thread = threading.Thread(target=process_analysis)
-    thread.start()
+    JOB_POOL.submit(process_analysis)
     
     return jsonify({
         "job_id": job_id,
-        "status": "running",
+        "status": "queued",
         "message": f"Analyzing wikir dataset {dataset_name} in the background"
     })
 
+# Wikipedia API endpoint and user agent for the WW2 article downloads
+WIKIPEDIA_API_URL = "https://en.wikipedia.org/w/api.php"
+WIKI_USER_AGENT = "WW2ArticlesExtractor/1.0 (papers-python-extractor; contact@example.com)"
+
+# Maximum number of article requests in flight at once
+WIKI_FETCH_CONCURRENCY = 16
+
+# Requests per second sent to Wikipedia across all concurrent downloads
+WIKI_REQUESTS_PER_SECOND = 5
+
+# Seconds allowed for one Wikipedia request, connection included
+WIKI_REQUEST_TIMEOUT = 30
+
+def _wiki_session():
+    """
+    Create the HTTP session used for Wikipedia requests. A job sends all of
+    its requests, title listings and article downloads alike, through one
+    session so they share a small pool of keep-alive connections.
+    
+    Returns:
+        aiohttp.ClientSession: Session to use as an async context manager
+    """
+    return aiohttp.ClientSession(
+        headers={'User-Agent': WIKI_USER_AGENT},
+        connector=aiohttp.TCPConnector(limit=WIKI_FETCH_CONCURRENCY),
+        timeout=aiohttp.ClientTimeout(total=WIKI_REQUEST_TIMEOUT)
+    )
+
+# Downloaded articles waiting to be rendered; fetching pauses when full
+WIKI_RENDER_QUEUE_SIZE = 32
+
+# The WW2 job publishes its counters and a progress message every this
+# many articles
+WW2_PROGRESS_EVERY = 25
+
+# Categories listed for WW2 article titles, in order, until the limit is met
+WW2_CATEGORIES = [
+    'World_War_II',
+    'World_War_II_by_country',
+    'Military_equipment_of_World_War_II',
+    'Battles_of_World_War_II',
+    'Military_operations_of_World_War_II',
+    'World_War_II_military_personnel'
+]
+
+# Category members returned per listing request (the API maximum)
+CATEGORY_PAGE_SIZE = 500
+
+async def _iter_category_members(session, category):
+    """
+    Yield the titles of the articles in a Wikipedia category, one listing
+    page at a time.
+    
+    Args:
+        session (aiohttp.ClientSession): Session to send the requests with
+        category (str): Category name without the "Category:" prefix
+    
+    Yields:
+        str: Article titles (main namespace only)
+    """
+    params = {
+        'action': 'query',
+        'list': 'categorymembers',
+        'cmtitle': f'Category:{category}',
+        'cmnamespace': '0',
+        'cmlimit': str(CATEGORY_PAGE_SIZE),
+        'format': 'json'
+    }
+    while True:
+        async with session.get(WIKIPEDIA_API_URL, params=params) as response:
+            response.raise_for_status()
+            data = await response.json()
+        for member in data.get('query', {}).get('categorymembers', []):
+            yield member['title']
+        if 'continue' not in data:
+            return
+        params.update(data['continue'])
+
+async def iter_ww2_titles(session, limit, errors):
+    """
+    Yield titles of Wikipedia articles related to World War II as the
+    category listings arrive, so downloads can start before the listing
+    is complete.
+    
+    Args:
+        session (aiohttp.ClientSession): Session to send the requests with
+        limit (int): Maximum number of titles to yield
+        errors (list): Receives a message for each category that failed
+    
+    Yields:
+        str: Article titles, without duplicates
+    """
+    print(f"Starting to fetch up to {limit} WW2 articles")
+    seen = set()
+    for category in WW2_CATEGORIES:
+        if len(seen) >= limit:
+            break
+        try:
+            async for title in _iter_category_members(session, category):
+                if title in seen:
+                    continue
+                seen.add(title)
+                yield title
+                if len(seen) % 50 == 0:
+                    print(f"Fetched {len(seen)} article titles so far")
+                if len(seen) >= limit:
+                    break
+        except Exception as e:
+            errors.append(f"Error fetching category {category}: {str(e)}")
+    print(f"Total articles fetched: {len(seen)}")
+
 def fetch_ww2_articles(limit=500):
     """
     Fetch Wikipedia articles related to World War II.
@@ -652,108 +1810,338 @@ def fetch_ww2_articles(limit=500):
         limit (int): Maximum number of articles to fetch
         
     Returns:
-        list: List of article titles
+        tuple: (list of article titles, list of error messages)
     """
-    print(f"Starting to fetch up to {limit} WW2 articles")
+    errors = []
     
-    # Connect to Wikipedia with a proper user agent
-    user_agent = "WW2ArticlesExtractor/1.0 (papers-python-extractor; contact@example.com)"
-    site = mwclient.Site('en.wikipedia.org', clients_useragent=user_agent)
+    async def collect():
+        async with _wiki_session() as session:
+            return [title async for title in iter_ww2_titles(session, limit, errors)]
     
-    # Get category members for World War II
-    category = site.Categories['World_War_II']
+    return asyncio.run(collect()), errors
+
+# Only this much of an article ends up in its PDF
+MAX_ARTICLE_CHARS = 50000
+
+# Downloaded article texts are kept here so reruns do not fetch them again;
+# entries younger than WIKI_CACHE_TTL_SECONDS are used without a request,
+# older ones are revalidated with their ETag when Wikipedia sent one
+WIKI_CACHE_DIR = os.environ.get('WIKI_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'parquet-extractor-cache', 'wiki'))
+WIKI_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+def _wiki_cache_path(title):
+    return os.path.join(WIKI_CACHE_DIR, hashlib.sha1(title.encode('utf-8')).hexdigest() + '.json')
+
+def _read_wiki_cache(title):
+    """
+    Return the cached download of an article, or None if there is none or
+    the entry is unreadable or malformed.
     
-    titles = []
-    errors = []
+    Args:
+        title (str): The title of the Wikipedia article
     
-    # Fetch articles from the category
+    Returns:
+        dict: The cache entry ("etag", "fetched", "content", "summary")
+    """
     try:
-        for i, page in enumerate(category.members()):
-            if i >= limit:
-                break
-                
-            if page.namespace == 0:  # Regular articles only, not talk pages etc.
-                titles.append(page.name)
-                
-            if i % 50 == 0:
-                print(f"Fetched {i} articles so far")
-    except Exception as e:
-        errors.append(f"Error fetching category members: {str(e)}")
-        
-    print(f"Fetched {len(titles)} article titles from World War II category")
-    
-    # If we need more articles, try to fetch from related categories
-    related_categories = [
-        'World_War_II_by_country',
-        'Military_equipment_of_World_War_II',
-        'Battles_of_World_War_II',
-        'Military_operations_of_World_War_II',
-        'World_War_II_military_personnel'
-    ]
-    
-    if len(titles) < limit:
-        for cat_name in related_categories:
-            if len(titles) >= limit:
-                break
-                
-            try:
-                category = site.Categories[cat_name]
-                for i, page in enumerate(category.members()):
-                    if len(titles) >= limit:
-                        break
-                        
-                    if page.namespace == 0 and page.name not in titles:
-                        titles.append(page.name)
-                        
-                    if i % 50 == 0:
-                        print(f"Fetched {i} articles from category {cat_name}")
-            except Exception as e:
-                errors.append(f"Error fetching category {cat_name}: {str(e)}")
+        with open(_wiki_cache_path(title), 'rb') as f:
+            entry = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
     
-    print(f"Total articles fetched: {len(titles)}")
-    return titles, errors
+    if not (isinstance(entry, dict)
+            and isinstance(entry.get("fetched"), (int, float)) and not isinstance(entry["fetched"], bool)
+            and isinstance(entry.get("content"), str)
+            and isinstance(entry.get("summary"), str)
+            and isinstance(entry.get("etag"), (str, type(None)))):
+        return None
+    return entry
 
-def download_wiki_article_to_pdf(title, output_dir):
+def _write_wiki_cache(title, entry):
     """
-    Download a Wikipedia article and convert it to PDF.
+    Store the download of an article in the cache. Failures are ignored,
+    since the cache only saves repeated downloads.
     
     Args:
         title (str): The title of the Wikipedia article
-        output_dir (str): Directory to save the PDF
+        entry (dict): The cache entry ("etag", "fetched", "content", "summary")
+    """
+    path = _wiki_cache_path(title)
+    # Write to a temporary name so a partial entry is never read
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        _ensure_dir(WIKI_CACHE_DIR)
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(entry))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not cache article {title}: {str(e)}")
+        _remove_file(tmp_path)
+
+class _RateLimiter:
+    """
+    Token bucket shared by concurrent coroutines, used as
+    "async with limiter:".
+    
+    Up to rate requests can start at once; after that a new one starts
+    each time a token refills, so the limit applies to the total request
+    rate rather than adding a fixed delay after every request. Each request
+    reserves its token under a thread lock and then sleeps off any deficit,
+    so one limiter can be shared by jobs running on different event loops.
+    """
+    def __init__(self, rate, per=1.0):
+        self.rate = rate
+        self.per = per
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _reserve(self):
+        """
+        Take a token, going into debt if none is left.
         
+        Returns:
+            float: Seconds to wait before the request may start
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.per)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens * self.per / self.rate)
+    
+    async def __aenter__(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+# One limiter for every WW2 job in this process, so concurrent jobs share
+# the WIKI_REQUESTS_PER_SECOND budget instead of each getting their own
+_WIKI_LIMITER = _RateLimiter(WIKI_REQUESTS_PER_SECOND)
+
+async def _fetch_article(session, semaphore, limiter, title):
+    """
+    Fetch the plain-text extract of one Wikipedia article.
+    
+    Args:
+        session (aiohttp.ClientSession): Session to send the request with
+        semaphore (asyncio.Semaphore): Limits the number of requests in flight
+        limiter (_RateLimiter): Limits the rate at which requests are sent
+        title (str): The title of the Wikipedia article
+    
     Returns:
-        dict: Status of the download and conversion
+        dict: "success" with the article's text and summary, or "error"
     """
+    params = {
+        'action': 'query',
+        'prop': 'extracts',
+        'explaintext': '1',
+        'exsectionformat': 'wiki',
+        'redirects': '1',
+        'titles': title,
+        'format': 'json'
+    }
+    # Cache files are read and written on a thread so disk I/O does not
+    # stall the other downloads on the event loop
+    cached = await asyncio.to_thread(_read_wiki_cache, title)
+    if cached is not None and time.time() - cached["fetched"] < WIKI_CACHE_TTL_SECONDS:
+        print(f"Using cached content for: {title}")
+        return {"status": "success", "content": cached["content"], "summary": cached["summary"]}
+    
+    headers = {'If-None-Match': cached["etag"]} if cached is not None and cached.get("etag") else None
     try:
-        print(f"Starting to download article: {title}")
-        
-        # Initialize Wikipedia API with a proper user agent
-        user_agent = "WW2ArticlesExtractor/1.0 (papers-python-extractor; contact@example.com)"
-        wiki_wiki = wikipediaapi.Wikipedia(
-            user_agent=user_agent,
-            language='en'
-        )
+        async with semaphore, limiter:
+            async with session.get(WIKIPEDIA_API_URL, params=params, headers=headers) as response:
+                if response.status == 304:
+                    data = None
+                else:
+                    response.raise_for_status()
+                    data = await response.json()
+                    etag = response.headers.get('ETag')
         
-        # Get the page
-        page = wiki_wiki.page(title)
+        if data is None:
+            print(f"Cached content is still current for: {title}")
+            cached["fetched"] = time.time()
+            await asyncio.to_thread(_write_wiki_cache, title, cached)
+            return {"status": "success", "content": cached["content"], "summary": cached["summary"]}
         
-        if not page.exists():
+        pages = data.get('query', {}).get('pages', {})
+        page = next(iter(pages.values()), {})
+        if 'missing' in page or 'extract' not in page:
             print(f"Page does not exist: {title}")
             return {
                 "status": "error",
                 "message": f"Page '{title}' does not exist"
             }
-            
-        # Get content
-        content = page.text
-        summary = page.summary
         
+        content = page['extract']
         print(f"Successfully retrieved content for: {title}")
         print(f"Content length: {len(content)} characters")
         
+        # The summary is the lead section, before the first "== Heading =="
+        summary = re.split(r'\n+==', content, maxsplit=1)[0].strip()
+        content = content[:MAX_ARTICLE_CHARS]
+        await asyncio.to_thread(
+            _write_wiki_cache, title, {"etag": etag, "fetched": time.time(), "content": content, "summary": summary}
+        )
+        return {
+            "status": "success",
+            "content": content,
+            "summary": summary
+        }
+    except Exception as e:
+        print(f"Error downloading article {title}: {str(e)}")
+        return {
+            "status": "error",
+            "message": f"Error downloading '{title}': {str(e)}"
+        }
+
+async def _fetch_articles_async(titles):
+    semaphore = asyncio.Semaphore(WIKI_FETCH_CONCURRENCY)
+    limiter = _WIKI_LIMITER
+    async with _wiki_session() as session:
+        return await asyncio.gather(*(_fetch_article(session, semaphore, limiter, title) for title in titles))
+
+def fetch_wiki_articles(titles):
+    """
+    Download the text of several Wikipedia articles concurrently.
+    
+    Args:
+        titles (list): Titles of the Wikipedia articles
+    
+    Returns:
+        list: One result dict per title, in the same order (see _fetch_article)
+    """
+    print(f"Downloading {len(titles)} articles, {WIKI_FETCH_CONCURRENCY} at a time, "
+          f"at most {WIKI_REQUESTS_PER_SECOND} requests per second")
+    return asyncio.run(_fetch_articles_async(titles))
+
+async def _download_articles_to_pdf_async(titles, output_dir, on_result):
+    # Two-stage pipeline: fetchers download articles into a bounded queue
+    # that one renderer per core drains into the process pool, so downloads
+    # and rendering overlap and fetchers pause when rendering falls behind
+    title_queue = asyncio.Queue(maxsize=WIKI_RENDER_QUEUE_SIZE)
+    render_queue = asyncio.Queue(maxsize=WIKI_RENDER_QUEUE_SIZE)
+    
+    semaphore = asyncio.Semaphore(WIKI_FETCH_CONCURRENCY)
+    limiter = _WIKI_LIMITER
+    
+    async def producer(session):
+        try:
+            source = titles(session) if callable(titles) else titles
+            if hasattr(source, '__aiter__'):
+                async for title in source:
+                    await title_queue.put(title)
+            else:
+                for title in source:
+                    await title_queue.put(title)
+        finally:
+            # One stop marker per fetcher
+            for _ in range(WIKI_FETCH_CONCURRENCY):
+                await title_queue.put(None)
+    
+    async def fetcher(session):
+        while (title := await title_queue.get()) is not None:
+            article = await _fetch_article(session, semaphore, limiter, title)
+            if article["status"] == "success":
+                await render_queue.put((title, article))
+            else:
+                on_result(title, article)
+    
+    async def renderer():
+        while True:
+            item = await render_queue.get()
+            if item is None:
+                return
+            title, article = item
+            try:
+                result = await asyncio.wrap_future(_pool_submit(
+                    wiki_article_to_pdf, title, article["content"], article["summary"], output_dir
+                ))
+            except Exception as e:
+                # Keep draining the queue so the fetchers never block on it
+                result = {
+                    "status": "error",
+                    "message": f"Error creating PDF for '{title}': {str(e)}"
+                }
+            on_result(title, result)
+    
+    renderers = [asyncio.create_task(renderer()) for _ in range(os.cpu_count() or 1)]
+    async with _wiki_session() as session:
+        await asyncio.gather(producer(session), *(fetcher(session) for _ in range(WIKI_FETCH_CONCURRENCY)))
+    
+    for _ in renderers:
+        await render_queue.put(None)
+    await asyncio.gather(*renderers)
+
+def download_wiki_articles_to_pdf(titles, output_dir, on_result):
+    """
+    Download several Wikipedia articles concurrently and convert each to PDF
+    as soon as it arrives.
+    
+    Args:
+        titles (list): Titles of the Wikipedia articles, an async iterable
+            of them (downloads start as the titles arrive), or a function
+            that takes the download session and returns such an iterable
+        output_dir (str): Directory to save the PDFs
+        on_result (callable): Called as on_result(title, result) for each
+            article in completion order, where result is the status dict of
+            the download and conversion
+    """
+    print(f"Downloading articles {WIKI_FETCH_CONCURRENCY} at a time, "
+          f"at most {WIKI_REQUESTS_PER_SECOND} requests per second")
+    asyncio.run(_download_articles_to_pdf_async(titles, output_dir, on_result))
+
+def download_wiki_article_to_pdf(title, output_dir):
+    """
+    Download a Wikipedia article and convert it to PDF.
+    
+    Args:
+        title (str): The title of the Wikipedia article
+        output_dir (str): Directory to save the PDF
+        
+    Returns:
+        dict: Status of the download and conversion
+    """
+    print(f"Starting to download article: {title}")
+    article = fetch_wiki_articles([title])[0]
+    if article["status"] != "success":
+        return article
+    return wiki_article_to_pdf(title, article["content"], article["summary"], output_dir)
+
+def _wiki_pdf_filename(title):
+    """
+    Return the PDF filename used for a Wikipedia article.
+    
+    Args:
+        title (str): The title of the Wikipedia article
+    
+    Returns:
+        str: Filename with unsafe characters replaced by underscores
+    """
+    safe_title = "".join([c if c.isalnum() or c in ' ._-' else '_' for c in title])
+    return f"{safe_title}.pdf"
+
+def wiki_article_to_pdf(title, content, summary, output_dir):
+    """
+    Convert a downloaded Wikipedia article to PDF.
+    
+    Args:
+        title (str): The title of the Wikipedia article
+        content (str): The article text
+        summary (str): The article summary
+        output_dir (str): Directory to save the PDF
+        
+    Returns:
+        dict: Status of the conversion
+    """
+    try:
         # Generate a safe filename
-        safe_title = "".join([c if c.isalnum() or c in ' ._-' else '_' for c in title])
-        filename = f"{safe_title}.pdf"
+        filename = _wiki_pdf_filename(title)
         filepath = os.path.join(output_dir, filename)
         
         print(f"Saving to: {filepath}")
@@ -772,46 +2160,38 @@ def download_wiki_article_to_pdf(title, output_dir):
             # Encode title safely
             safe_title_text = title[:80]
             # Remove non-ASCII characters
-            safe_title_text = ''.join(c if ord(c) < 128 else ' ' for c in safe_title_text)
+            safe_title_text = safe_title_text.translate(_ASCII_SPACE)
             
-            pdf.cell(0, 10, txt=safe_title_text, ln=True)
+            pdf.cell(0, 10, text=safe_title_text, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
             
             # Add summary
             if summary:
                 pdf.set_font_size(12)
                 pdf.set_font("Helvetica", "I")
                 # Make sure summary text is ASCII-compatible
-                safe_summary = ''.join(c if ord(c) < 128 else ' ' for c in summary[:500])
-                pdf.multi_cell(0, 10, txt=f"Summary: {safe_summary}...")
+                safe_summary = summary[:500].translate(_ASCII_SPACE)
+                pdf.multi_cell(0, 10, text=f"Summary: {safe_summary}...", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
             
             # Add content
             pdf.set_font_size(10)
             pdf.set_font("Helvetica", "")
             
-            # Split content into smaller chunks to avoid memory issues
-            # Using even smaller chunks for more reliability
-            content_chunks = [content[i:i+1000] for i in range(0, min(len(content), 50000), 1000)]
+            # Limit content to avoid memory issues
+            content = content[:MAX_ARTICLE_CHARS]
             
-            print(f"Split content into {len(content_chunks)} chunks")
-            
-            for i, chunk in enumerate(content_chunks):
-                try:
-                    # Sanitize content for PDF - replace non-ASCII chars with spaces
-                    sanitized_chunk = ''.join(c if ord(c) < 128 else ' ' for c in chunk)
-                    # Also replace any control characters
-                    sanitized_chunk = ''.join(c if ord(c) >= 32 or c in '\n\r\t' else ' ' for c in sanitized_chunk)
-                    pdf.multi_cell(0, 8, txt=sanitized_chunk)
-                    
-                    if i % 5 == 0:
-                        print(f"Processed chunk {i}/{len(content_chunks)}")
-                except Exception as chunk_error:
-                    print(f"Error processing chunk {i}: {str(chunk_error)}")
-                    # Continue with next chunk
+            try:
+                # Sanitize content for PDF - replace non-ASCII and control
+                # characters with spaces
+                sanitized = content.translate(_WIKI_TEXT_TABLE)
+                # multi_cell wraps the text itself, so it is added in one call
+                pdf.multi_cell(0, 8, text=sanitized, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+            except Exception as content_error:
+                print(f"Error adding content: {str(content_error)}")
             
             # Save PDF
             print(f"Attempting to save PDF to {filepath}")
             try:
-                pdf.output(filepath)
+                _write_pdf(pdf, filepath)
                 print(f"Successfully saved PDF: {filepath}")
                 
                 # Double check file exists and has size
@@ -840,10 +2220,10 @@ def download_wiki_article_to_pdf(title, output_dir):
             }
             
     except Exception as e:
-        print(f"Error downloading article {title}: {str(e)}")
+        print(f"Error converting article {title}: {str(e)}")
         return {
             "status": "error",
-            "message": f"Error downloading '{title}': {str(e)}"
+            "message": f"Error converting '{title}': {str(e)}"
         }
 
 @app.route('/api/extract/ww2', methods=['POST'])
@@ -855,128 +2235,142 @@ def extract_ww2_articles():
     # Cap the limit at 1000 for safety
     limit = min(limit, 1000)
     
+    # Create the output directory up front so failures are reported here
+    # rather than inside the background job
+    try:
+        _ensure_dir(output_dir)
+    except OSError as e:
+        return jsonify({"error": f"Could not create output directory '{output_dir}': {e}"}), 500
+    
     # Generate a job ID
     job_id = str(uuid.uuid4())
     
     # Set initial job status
-    jobs[job_id] = {
+    _record_job(job_id, {
         "id": job_id,
-        "status": "running",
+        "status": "queued",
         "type": "ww2_wiki",
         "output_dir": output_dir,
         "limit": limit,
         "log": ["Job started", f"Output directory: {output_dir}", f"Article limit: {limit}"]
-    }
+    })
     
-    # Start the extraction in a background thread
+    # Run the extraction on the job thread pool
     def process_ww2_articles():
+        _update_job(job_id, status="running")
         try:
-            # Create output directory
-            os.makedirs(output_dir, exist_ok=True)
-            
             # Make sure the directory exists and is writable
             if not os.path.exists(output_dir):
                 error_msg = f"Failed to create output directory: {output_dir}"
-                jobs[job_id]["status"] = "failed"
-                jobs[job_id]["error"] = error_msg
-                jobs[job_id]["log"].append(error_msg)
+                _update_job(job_id, status="failed", error=error_msg)
+                _log_job(job_id, error_msg)
                 return
                 
-            try:
-                # Test write access by creating a temporary file
-                test_file = os.path.join(output_dir, "test_write.txt")
-                with open(test_file, 'w') as f:
-                    f.write("Testing write access")
-                os.remove(test_file)
-                jobs[job_id]["log"].append(f"Successfully verified write access to {output_dir}")
-            except Exception as write_error:
-                error_msg = f"Output directory {output_dir} is not writable: {str(write_error)}"
-                jobs[job_id]["status"] = "failed"
-                jobs[job_id]["error"] = error_msg
-                jobs[job_id]["log"].append(error_msg)
-                return
-            
-            # Fetch article titles
-            jobs[job_id]["log"].append(f"Fetching up to {limit} WW2 article titles from Wikipedia")
-            titles, fetch_errors = fetch_ww2_articles(limit)
-            
-            if fetch_errors:
-                jobs[job_id]["log"].append(f"Encountered {len(fetch_errors)} errors while fetching titles")
-                jobs[job_id]["fetch_errors"] = fetch_errors
-            
-            if not titles:
-                jobs[job_id]["status"] = "failed"
-                jobs[job_id]["error"] = "No article titles were found"
-                jobs[job_id]["log"].append("No article titles were found. Job aborted.")
+            # Check write access with a single syscall; a later failure to
+            # write still shows up as a per-article error
+            if not os.access(output_dir, os.W_OK):
+                error_msg = f"Output directory {output_dir} is not writable"
+                _update_job(job_id, status="failed", error=error_msg)
+                _log_job(job_id, error_msg)
                 return
+            _log_job(job_id, f"Verified write access to {output_dir} via os.access")
             
-            jobs[job_id]["log"].append(f"Found {len(titles)} article titles")
-            jobs[job_id]["article_count"] = len(titles)
-            jobs[job_id]["titles"] = titles[:100]  # Store first 100 titles for reference
-            
-            # Download articles and convert to PDF
-            total_articles = len(titles)
+            # Article titles are listed while the downloads run; PDFs already
+            # in the output directory from an earlier run (or from another
+            # title with the same filename) are skipped and count as
+            # successful since they are in place
+            with os.scandir(output_dir) as entries:
+                existing = {entry.name for entry in entries}
+            titles = []
+            fetch_errors = []
             successful = 0
             failed = 0
+            skipped = 0
             download_errors = []
             
-            jobs[job_id]["log"].append(f"Starting to download and convert {total_articles} articles")
+            published = 0
             
-            for i, title in enumerate(titles):
-                if i % 10 == 0:
-                    jobs[job_id]["log"].append(f"Progress: {i}/{total_articles} articles processed")
-                
-                result = download_wiki_article_to_pdf(title, output_dir)
+            def flush_progress(force=False):
+                # Counters are published every WW2_PROGRESS_EVERY articles
+                # rather than on each one, so pollers and progress streams
+                # are not woken up for every article
+                nonlocal published
+                processed = successful + failed
+                if processed - published >= WW2_PROGRESS_EVERY or (force and processed != published):
+                    published = processed
+                    _update_job(job_id, file_count=successful, successful=successful, failed=failed)
+                    _log_job(job_id, f"Progress: {processed}/{len(titles)} articles processed")
+            
+            async def new_titles(session):
+                nonlocal successful, skipped
+                async for title in iter_ww2_titles(session, limit, fetch_errors):
+                    titles.append(title)
+                    filename = _wiki_pdf_filename(title)
+                    if filename in existing:
+                        skipped += 1
+                        successful += 1
+                        flush_progress()
+                        continue
+                    existing.add(filename)
+                    yield title
                 
+                _log_job(job_id, f"Found {len(titles)} article titles, {skipped} already present (skipped)")
+                _update_job(
+                    job_id,
+                    article_count=len(titles),
+                    titles=titles[:100]  # Store first 100 titles for reference
+                )
+            
+            def record_result(title, result):
+                nonlocal successful, failed
                 if result["status"] == "success":
                     successful += 1
                 else:
                     failed += 1
-                    download_errors.append(f"{title}: {result['message']}")
-                
-                # Sleep briefly to avoid hammering the Wikipedia API
-                time.sleep(1)
+                    if len(download_errors) < MAX_JOB_ERRORS:
+                        download_errors.append(f"{title}: {result['message']}")
+                flush_progress()
             
-            # Update job status
-            if successful > 0:
-                jobs[job_id]["status"] = "completed"
-            else:
-                jobs[job_id]["status"] = "failed"
-                jobs[job_id]["error"] = "Failed to download any articles successfully"
-                
-            jobs[job_id]["successful"] = successful
-            jobs[job_id]["failed"] = failed
-            jobs[job_id]["log"].append(f"Completed: Successfully downloaded {successful} articles, failed: {failed}")
+            # Download and convert the articles concurrently as their titles
+            # arrive; results are recorded as each article finishes
+            _log_job(job_id, f"Fetching up to {limit} WW2 article titles from Wikipedia and downloading them as they arrive")
+            download_wiki_articles_to_pdf(new_titles, output_dir, record_result)
+            flush_progress(force=True)
+            
+            if fetch_errors:
+                _log_job(job_id, f"Encountered {len(fetch_errors)} errors while fetching titles")
+                _update_job(job_id, fetch_errors=fetch_errors)
             
+            if not titles:
+                _update_job(job_id, status="failed", error="No article titles were found")
+                _log_job(job_id, "No article titles were found. Job aborted.")
+                return
+            
+            _log_job(job_id, f"Completed: Successfully downloaded {successful} articles, failed: {failed}")
             if download_errors:
-                jobs[job_id]["download_errors"] = download_errors[:100]  # Store first 100 errors
-                jobs[job_id]["log"].append(f"Encountered {len(download_errors)} download errors")
-            
-            # Count files in output directory
-            if os.path.exists(output_dir):
-                files = os.listdir(output_dir)
-                jobs[job_id]["file_count"] = len(files)
-                jobs[job_id]["log"].append(f"Found {len(files)} files in output directory")
-                
-                if len(files) == 0 and successful > 0:
-                    jobs[job_id]["log"].append("WARNING: Directory is empty despite successful downloads reported")
+                _log_job(job_id, f"Encountered {failed} download errors")
+            
+            # Update job status last, together with the errors, so clients
+            # that stop at the final status see the complete record
+            final = {"download_errors": download_errors} if download_errors else {}  # First MAX_JOB_ERRORS errors
+            if successful > 0:
+                _update_job(job_id, status="completed", **final)
+            else:
+                _update_job(job_id, status="failed", error="Failed to download any articles successfully", **final)
                 
         except Exception as e:
             import traceback
-            jobs[job_id]["status"] = "failed"
-            jobs[job_id]["error"] = str(e)
-            jobs[job_id]["traceback"] = traceback.format_exc()
-            jobs[job_id]["log"].append(f"Job failed with error: {str(e)}")
+            _update_job(job_id, status="failed", error=str(e), traceback=traceback.format_exc())
+            _log_job(job_id, f"Job failed with error: {str(e)}")
     
-    # Start the processing thread
-    thread = threading.Thread(target=process_ww2_articles)
-    thread.start()
+    JOB_POOL.submit(process_ww2_articles)
     
     return jsonify({
         "job_id": job_id,
-        "status": "running",
+        "status": "queued",
         "message": f"Downloading WW2 Wikipedia articles in the background (limit: {limit})"
     })
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=4000) 
\ No newline at end of file
+    # Development server only; use gunicorn in production (see README)
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=4000, threaded=True) 
\ No newline at end of file
@@ -1,10 +1,39 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import argparse
 import os
+import shutil
+
+# Shared session so that repeated calls (e.g. the --wait polling loops)
+# reuse keep-alive connections instead of reconnecting every time
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=10,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+)
+_SESSION.mount('http://', _ADAPTER)
+_SESSION.mount('https://', _ADAPTER)
+
+# Bytes copied per read when saving a downloaded file
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Last ETag and body seen for each polled job, so unchanged jobs come back
+# as a bodiless 304
+_ETAGS = {}
+_LAST_BODY = {}
+
+# Seconds the server may hold a status request open waiting for a change
+JOB_WAIT_SECONDS = 30
+
+# Polling interval bounds for servers that answer straight away
+MIN_POLL_INTERVAL = 2
+MAX_POLL_INTERVAL = 30
 
 def check_health(api_base):
-    response = requests.get(f"{api_base}/api/health")
+    response = _SESSION.get(f"{api_base}/api/health")
     return response.json()
 
 def extract_parquet(api_base, file_path, output_dir='extracted_papers', num_papers=1000, seed=42):
@@ -15,7 +44,7 @@ def extract_parquet(api_base, file_path, output_dir='extracted_papers', num_pape
             'num_papers': str(num_papers),
             'seed': str(seed)
         }
-        response = requests.post(f"{api_base}/api/extract/parquet", files=files, data=data)
+        response = _SESSION.post(f"{api_base}/api/extract/parquet", files=files, data=data)
     
     return response.json()
 
@@ -23,20 +52,63 @@ def extract_cisi(api_base, file_path, output_dir='cisi_papers'):
     with open(file_path, 'rb') as f:
         files = {'file': (os.path.basename(file_path), f)}
         data = {'output_dir': output_dir}
-        response = requests.post(f"{api_base}/api/extract/cisi", files=files, data=data)
+        response = _SESSION.post(f"{api_base}/api/extract/cisi", files=files, data=data)
     
     return response.json()
 
-def get_job_status(api_base, job_id):
-    response = requests.get(f"{api_base}/api/jobs/{job_id}")
-    return response.json()
+def get_job_status(api_base, job_id, wait=None):
+    headers = {'If-None-Match': _ETAGS[job_id]} if job_id in _ETAGS else {}
+    params = {'wait': wait} if wait else None
+    response = _SESSION.get(f"{api_base}/api/jobs/{job_id}", headers=headers, params=params)
+    if response.status_code == 304:
+        return _LAST_BODY[job_id]
+    
+    body = response.json()
+    etag = response.headers.get('ETag')
+    if response.status_code == 200 and etag:
+        _ETAGS[job_id] = etag
+        _LAST_BODY[job_id] = body
+    return body
+
+def wait_for_job(api_base, job_id):
+    """
+    Wait for a job to finish, printing its status each time it is checked.
+    
+    Each check asks the server to hold the request until the job changes.
+    If the server answers with an unchanged job before the wait is up
+    instead, the checks back off exponentially.
+    
+    Args:
+        api_base (str): Base URL for the API
+        job_id (str): ID of the job to wait for
+        
+    Returns:
+        dict: The final job status
+    """
+    interval = MIN_POLL_INTERVAL
+    previous = None
+    while True:
+        started = time.monotonic()
+        status = get_job_status(api_base, job_id, wait=JOB_WAIT_SECONDS)
+        print(f"Status: {status.get('status')}")
+        if status.get('status') not in ('queued', 'running'):
+            return status
+        
+        # Compare by value: a 304 returns the same dict, but a server
+        # without long-polling may send an equal job in a new body
+        if status == previous and time.monotonic() - started < JOB_WAIT_SECONDS:
+            time.sleep(interval)
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
+        else:
+            interval = MIN_POLL_INTERVAL
+        previous = status
 
 def list_files(api_base, output_dir):
-    response = requests.get(f"{api_base}/api/files", params={'output_dir': output_dir})
+    response = _SESSION.get(f"{api_base}/api/files", params={'output_dir': output_dir})
     return response.json()
 
 def download_file(api_base, filename, output_dir, save_path=None):
-    response = requests.get(
+    response = _SESSION.get(
         f"{api_base}/api/files/{filename}", 
         params={'output_dir': output_dir},
         stream=True
@@ -46,9 +118,11 @@ def download_file(api_base, filename, output_dir, save_path=None):
         if save_path is None:
             save_path = filename
         
+        # Copy straight from the socket in large reads; decode_content
+        # undoes any Content-Encoding the server applied
+        response.raw.decode_content = True
         with open(save_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+            shutil.copyfileobj(response.raw, f, length=DOWNLOAD_CHUNK_SIZE)
         
         return {"status": "success", "file": save_path}
     else:
@@ -63,7 +137,7 @@ def extract_wikir(api_base, output_dir='wikir_pdfs', dataset_name='wikir/en1k/va
     if limit is not None:
         data['limit'] = str(limit)
     
-    response = requests.post(f"{api_base}/api/extract/wikir", data=data)
+    response = _SESSION.post(f"{api_base}/api/extract/wikir", data=data)
     return response.json()
 
 def analyze_wikir(api_base, dataset_name='wikir/en1k/validation', limit=None):
@@ -85,7 +159,7 @@ def analyze_wikir(api_base, dataset_name='wikir/en1k/validation', limit=None):
     if limit is not None:
         data['limit'] = str(limit)
     
-    response = requests.post(f"{api_base}/api/analyze/wikir", data=data)
+    response = _SESSION.post(f"{api_base}/api/analyze/wikir", data=data)
     return response.json()
 
 def main():
@@ -173,13 +247,8 @@ def main():
         
         if args.wait and job_id:
             print("Waiting for job to complete...")
-            while True:
-                status = get_job_status(args.api_base, job_id)
-                print(f"Status: {status['status']}")
-                if status['status'] in ['completed', 'failed']:
-                    print(f"Final status: {status}")
-                    break
-                time.sleep(2)
+            status = wait_for_job(args.api_base, job_id)
+            print(f"Final status: {status}")
     
     elif args.command == 'cisi':
         result = extract_cisi(args.api_base, args.file, args.output_dir)
@@ -188,13 +257,8 @@ def main():
         
         if args.wait and job_id:
             print("Waiting for job to complete...")
-            while True:
-                status = get_job_status(args.api_base, job_id)
-                print(f"Status: {status['status']}")
-                if status['status'] in ['completed', 'failed']:
-                    print(f"Final status: {status}")
-                    break
-                time.sleep(2)
+            status = wait_for_job(args.api_base, job_id)
+            print(f"Final status: {status}")
     
     elif args.command == 'job':
         result = get_job_status(args.api_base, args.job_id)
@@ -231,13 +295,8 @@ def main():
         
         if args.wait and job_id:
             print("Waiting for job to complete...")
-            while True:
-                status = get_job_status(args.api_base, job_id)
-                print(f"Status: {status['status']}")
-                if status['status'] in ['completed', 'failed']:
-                    print(f"Final status: {status}")
-                    break
-                time.sleep(2)
+            status = wait_for_job(args.api_base, job_id)
+            print(f"Final status: {status}")
     
     elif args.command == 'analyze-wikir':
         result = analyze_wikir(
@@ -250,22 +309,17 @@ def main():
         
         if args.wait and job_id:
             print("Waiting for analysis to complete...")
-            while True:
-                status = get_job_status(args.api_base, job_id)
-                print(f"Status: {status['status']}")
-                if status['status'] in ['completed', 'failed']:
-                    print(f"Final status: {status}")
-                    if status['status'] == 'completed' and 'result' in status:
-                        result = status['result']
-                        print("\nToken Analysis Results:")
-                        print(f"Dataset: {result['dataset']}")
-                        print(f"Document count: {result['document_count']}")
-                        print(f"Total tokens: {result['total_tokens']:,}")
-                        print(f"Average tokens per document: {result['average_tokens_per_doc']:.2f}")
-                        print(f"Min tokens in a document: {result['min_tokens']}")
-                        print(f"Max tokens in a document: {result['max_tokens']}")
-                    break
-                time.sleep(2)
+            status = wait_for_job(args.api_base, job_id)
+            print(f"Final status: {status}")
+            if status.get('status') == 'completed' and 'result' in status:
+                result = status['result']
+                print("\nToken Analysis Results:")
+                print(f"Dataset: {result['dataset']}")
+                print(f"Document count: {result['document_count']}")
+                print(f"Total tokens: {result['total_tokens']:,}")
+                print(f"Average tokens per document: {result['average_tokens_per_doc']:.2f}")
+                print(f"Min tokens in a document: {result['min_tokens']}")
+                print(f"Max tokens in a document: {result['max_tokens']}")
     
     else:
         parser.print_help()
@@ -5,6 +5,27 @@ Cleanup script to remove all PDF files in the wikir_pdfs directory
 import os
 import shutil
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of files removed at once; each removal mostly waits on the
+# filesystem, so they overlap well even on local disks
+DELETE_WORKERS = 32
+
+def _remove_file(file_path):
+    """
+    Remove one file, returning the error instead of raising it.
+    
+    Args:
+        file_path (str): Path of the file to remove
+    
+    Returns:
+        Exception: The error raised by os.remove, or None on success
+    """
+    try:
+        os.remove(file_path)
+    except Exception as e:
+        return e
+    return None
 
 def cleanup_wikir_pdfs(directory="wikir_pdfs", confirm=False):
     """
@@ -18,10 +39,13 @@ def cleanup_wikir_pdfs(directory="wikir_pdfs", confirm=False):
         print(f"Directory {directory} does not exist!")
         return
     
-    # Count files
-    files = [f for f in os.listdir(directory) if f.endswith('.pdf')]
+    # Count files; scandir entries already know whether they are regular
+    # files, so only the size needs a stat call
+    with os.scandir(directory) as it:
+        entries = [e for e in it if e.name.endswith('.pdf') and e.is_file()]
+    files = [e.name for e in entries]
     total_files = len(files)
-    total_size = sum(os.path.getsize(os.path.join(directory, f)) for f in files)
+    total_size = sum(e.stat().st_size for e in entries)
     
     print(f"Found {total_files} PDF files in {directory}")
     print(f"Total size: {total_size / (1024*1024):.2f} MB")
@@ -42,14 +66,13 @@ def cleanup_wikir_pdfs(directory="wikir_pdfs", confirm=False):
     
     # Option 1: Remove individual files
     if total_files < 1000:
-        for f in files:
-            file_path = os.path.join(directory, f)
-            try:
-                os.remove(file_path)
-                if total_files < 100:  # Only print for smaller numbers
+        paths = [os.path.join(directory, f) for f in files]
+        with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as executor:
+            for f, error in zip(files, executor.map(_remove_file, paths)):
+                if error is not None:
+                    print(f"Error deleting {f}: {error}")
+                elif total_files < 100:  # Only print for smaller numbers
                     print(f"Deleted: {f}")
-            except Exception as e:
-                print(f"Error deleting {f}: {e}")
     # Option 2: For large numbers, remove and recreate the directory
     else:
         try:
@@ -62,7 +85,8 @@ def cleanup_wikir_pdfs(directory="wikir_pdfs", confirm=False):
             
     # Verify
     if os.path.exists(directory):
-        remaining = [f for f in os.listdir(directory) if f.endswith('.pdf')]
+        with os.scandir(directory) as it:
+            remaining = [e.name for e in it if e.name.endswith('.pdf') and e.is_file()]
         if remaining:
             print(f"Warning: {len(remaining)} PDF files still remain in the directory.")
         else:
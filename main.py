@@ -1,10 +1,305 @@
 import os
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 from tqdm import tqdm
 import random
 import argparse
 from pathlib import Path
 import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of threads writing markdown files; writes are independent and
+# mostly wait on the filesystem, so they overlap with formatting the next file
+WRITE_WORKERS = 16
+
+# Files allowed to wait for a writer thread before extraction pauses to
+# let the writes catch up
+MAX_PENDING_WRITES = 1024
+
+# Metadata columns with at most this many distinct values per paper are
+# formatted once per distinct value instead of once per paper
+LOW_CARDINALITY_RATIO = 0.01
+
+# Rows of content decoded at a time when extracting a whole file
+STREAM_BATCH_SIZE = 1024
+
+# Characters not allowed in generated filenames. \w matches exactly what
+# str.isalnum() accepts plus '_', so this keeps the same characters as the
+# old per-character check while the scan runs inside the regex engine
+_FILENAME_UNSAFE_RE = re.compile(r'[^\w \-]')
+
+# The same rule as a bytes.translate table, for the common all-ASCII title
+_ASCII_FILENAME_TABLE = bytes(c if chr(c).isalnum() or chr(c) in " -_" else ord("_") for c in range(128)) + b"_" * 128
+
+def _sanitize_filename(text):
+    """
+    Replace every character that is not alphanumeric, a space, '-' or '_'
+    with '_'.
+    
+    ASCII text goes through a byte translate table, which is several times
+    faster than the regex used for everything else.
+    
+    Args:
+        text (str): Text to sanitize
+    
+    Returns:
+        str: The sanitized text, the same length as the input
+    """
+    if text.isascii():
+        return text.encode("ascii").translate(_ASCII_FILENAME_TABLE).decode("ascii")
+    return _FILENAME_UNSAFE_RE.sub("_", text)
+
+def _write_file(path, parts):
+    """
+    Write byte strings to a file, back to back, with unbuffered writes.
+    
+    The parts go out in a single gathered writev call where the platform
+    has one, so the header and body never have to be copied into one buffer.
+    
+    Args:
+        path (str): Path of the file to create or overwrite
+        parts (list): bytes objects making up the file contents, in order
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        written = os.writev(fd, parts) if hasattr(os, 'writev') else 0
+        if written < sum(len(part) for part in parts):
+            # Short write (or no writev): finish with plain writes
+            view = memoryview(b"".join(parts))[written:]
+            while view:
+                view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def _read_head(parquet):
+    """
+    Read the first row of a parquet file as a DataFrame, for choosing the
+    content and title columns without loading the whole file.
+    
+    Args:
+        parquet (pyarrow.parquet.ParquetFile): The open parquet file
+    
+    Returns:
+        pandas.DataFrame: The first row, or an empty frame with the file's
+            columns if it has no rows
+    """
+    if parquet.metadata.num_rows == 0:
+        return parquet.schema_arrow.empty_table().to_pandas()
+    batch = next(parquet.iter_batches(batch_size=1))
+    return pa.Table.from_batches([batch]).to_pandas()
+
+def _locate_rows(parquet, indices):
+    """
+    Find the row group holding each of the given rows of a parquet file.
+    
+    Args:
+        parquet (pyarrow.parquet.ParquetFile): The open parquet file
+        indices (list): Row numbers within the whole file
+    
+    Returns:
+        tuple: int64 arrays of each row's row group and its row number
+            within that group, and of the size of every row group
+    """
+    # The index arithmetic runs on int64 arrays
+    metadata = parquet.metadata
+    indices = np.asarray(indices, dtype=np.int64)
+    group_sizes = np.array([metadata.row_group(g).num_rows for g in range(metadata.num_row_groups)], dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(group_sizes)))
+    row_groups = np.searchsorted(starts, indices, side='right') - 1
+    return row_groups, indices - starts[row_groups], group_sizes
+
+def _read_rows(parquet, indices, columns=None):
+    """
+    Read the given rows of a parquet file, in the given order, decoding
+    only the row groups that contain them.
+    
+    Args:
+        parquet (pyarrow.parquet.ParquetFile): The open parquet file
+        indices (list): Row numbers within the whole file
+        columns (list): Columns to read (None for all)
+    
+    Returns:
+        pyarrow.Table: The requested rows
+    """
+    row_groups, group_rows, group_sizes = _locate_rows(parquet, indices)
+    
+    # Where each selected row group begins in the table read back
+    selected = np.unique(row_groups)
+    offsets = np.zeros(len(group_sizes), dtype=np.int64)
+    offsets[selected] = np.cumsum(group_sizes[selected]) - group_sizes[selected]
+    
+    table = parquet.read_row_groups(selected.tolist(), columns=columns, use_threads=True)
+    positions = offsets[row_groups] + group_rows
+    return table.take(pa.array(positions, type=pa.int64()))
+
+def _utf8_values(values):
+    """
+    Convert a column of paper content to UTF-8 bytes, one per row.
+    
+    Arrow already stores strings as UTF-8, so string columns are
+    reinterpreted as binary and copied out as bytes, without decoding them
+    to str and encoding them back.
+    
+    Args:
+        values (pyarrow.Array): The column values
+    
+    Returns:
+        list: The values as bytes (None where missing)
+    """
+    if pa.types.is_dictionary(values.type):
+        values = values.cast(values.type.value_type)
+    if pa.types.is_string(values.type):
+        return values.cast(pa.binary()).to_pylist()
+    if pa.types.is_large_string(values.type):
+        return values.cast(pa.large_binary()).to_pylist()
+    return [value.encode('utf-8') for value in values.to_pylist()]
+
+def _file_has_nulls(parquet, column):
+    """
+    Check whether a top-level column holds nulls anywhere in a parquet
+    file, using the row group statistics when every row group has them.
+    
+    Args:
+        parquet (pyarrow.parquet.ParquetFile): The open parquet file
+        column (str): Column to check
+    
+    Returns:
+        bool: True if any row of the file is null in this column
+    """
+    metadata = parquet.metadata
+    leaves = [i for i in range(metadata.num_columns) if metadata.schema.column(i).path == column]
+    for g in range(metadata.num_row_groups):
+        for leaf in leaves:
+            stats = metadata.row_group(g).column(leaf).statistics
+            if stats is None or not stats.has_null_count:
+                # No statistics to go on: read the column and count
+                return parquet.read(columns=[column]).column(0).null_count > 0
+            if stats.null_count > 0:
+                return True
+    return False
+
+def _cast_nullable_ints(parquet, table):
+    """
+    Cast the integer columns of a partial read to float64 when they hold
+    nulls anywhere in the file.
+    
+    pandas turns an integer column with nulls into float64, so without
+    this a sample would print 2000 or 2000.0 depending on whether the
+    sampled row groups happen to contain a null. Deciding on the whole
+    file keeps the front matter the same as reading every row.
+    
+    Args:
+        parquet (pyarrow.parquet.ParquetFile): The open parquet file
+        table (pyarrow.Table): Rows read from some of its row groups
+    
+    Returns:
+        pyarrow.Table: The table with those columns cast
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_integer(field.type) and _file_has_nulls(parquet, field.name):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+    return table
+
+def _iter_sampled_rows(parquet, indices, column):
+    """
+    Read one column of the given rows of a parquet file, one row group at
+    a time.
+    
+    Args:
+        parquet (pyarrow.parquet.ParquetFile): The open parquet file
+        indices (list): Row numbers within the whole file
+        column (str): Column to read
+    
+    Yields:
+        tuple: Positions within ``indices`` of the rows from one row group,
+            and their values as UTF-8 bytes
+    """
+    row_groups, group_rows, _ = _locate_rows(parquet, indices)
+    order = np.argsort(row_groups, kind='stable')
+    groups, firsts = np.unique(row_groups[order], return_index=True)
+    for group, positions in zip(groups.tolist(), np.split(order, firsts[1:])):
+        values = parquet.read_row_group(group, columns=[column]).column(0)
+        yield positions.tolist(), _utf8_values(values.take(pa.array(group_rows[positions])))
+
+def _iter_all_rows(parquet, column):
+    """
+    Read one column of every row of a parquet file, in batches.
+    
+    Args:
+        parquet (pyarrow.parquet.ParquetFile): The open parquet file
+        column (str): Column to read
+    
+    Yields:
+        tuple: Row numbers of one batch and their values as UTF-8 bytes
+    """
+    start = 0
+    for batch in parquet.iter_batches(batch_size=STREAM_BATCH_SIZE, columns=[column]):
+        yield range(start, start + batch.num_rows), _utf8_values(batch.column(0))
+        start += batch.num_rows
+
+def _read_ahead(iterable):
+    """
+    Iterate while the next item is produced on a background thread, so
+    producing it overlaps with the caller's work on the current one.
+    
+    Args:
+        iterable: Items to produce; only one is ever produced at a time
+    
+    Yields:
+        The items of ``iterable``, in order
+    """
+    iterator = iter(iterable)
+    done = object()
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        upcoming = reader.submit(next, iterator, done)
+        while True:
+            item = upcoming.result()
+            if item is done:
+                return
+            upcoming = reader.submit(next, iterator, done)
+            yield item
+
+def _is_binary(arrow_type):
+    """
+    Check whether a column of this Arrow type holds bytes values once
+    converted to pandas.
+    
+    Args:
+        arrow_type (pyarrow.DataType): The column type
+    
+    Returns:
+        bool: True for binary columns, including dictionary-encoded ones
+    """
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    return (pa.types.is_binary(arrow_type)
+            or pa.types.is_large_binary(arrow_type)
+            or pa.types.is_fixed_size_binary(arrow_type))
+
+def _is_categorical(arrow_type):
+    """
+    Check whether equal values of this Arrow type always print the same,
+    so a column of it can be formatted once per distinct value.
+    
+    Floats are excluded (0.0 and -0.0 are equal but print differently), as
+    are nested types, whose values are not hashable.
+    
+    Args:
+        arrow_type (pyarrow.DataType): The column type
+    
+    Returns:
+        bool: True for string, integer and boolean columns, including
+            dictionary-encoded ones
+    """
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    return (pa.types.is_string(arrow_type)
+            or pa.types.is_large_string(arrow_type)
+            or pa.types.is_integer(arrow_type)
+            or pa.types.is_boolean(arrow_type))
 
 def extract_papers(parquet_file, output_dir, num_papers=1000, seed=42):
     """
@@ -15,6 +310,9 @@ def extract_papers(parquet_file, output_dir, num_papers=1000, seed=42):
         output_dir (str): Directory to save the markdown files
         num_papers (int): Number of papers to extract
         seed (int): Random seed for reproducibility
+    
+    Returns:
+        int: Number of markdown files written
     """
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
@@ -23,86 +321,206 @@ def extract_papers(parquet_file, output_dir, num_papers=1000, seed=42):
     random.seed(seed)
     
     print(f"Loading parquet file: {parquet_file}")
-    # Read the parquet file
-    df = pd.read_parquet(parquet_file)
-    
-    # Get the column names to understand the structure
-    print(f"Columns in the dataset: {df.columns.tolist()}")
-    
-    # Determine which column contains the markdown content
-    # This is an assumption that needs to be adjusted based on your actual data
-    content_column = None
-    possible_columns = ['text', 'content', 'markdown', 'mmd', 'body']
-    
-    for col in possible_columns:
-        if col in df.columns:
-            content_column = col
-            break
-    
-    if not content_column:
-        # If none of the expected columns are found, use the first text-like column
-        for col in df.columns:
-            if df[col].dtype == 'object':  # Usually string columns are object type
-                sample = df[col].iloc[0] if not df.empty else ""
-                if isinstance(sample, str) and len(sample) > 100:  # Heuristic for content
-                    content_column = col
-                    break
-    
-    if not content_column:
-        raise ValueError("Could not identify a column containing paper content. Please specify manually.")
-    
-    print(f"Using '{content_column}' as the content column")
-    
-    # Get the title column (again, assumption)
-    title_column = None
-    for col in ['title', 'name', 'paper_title']:
-        if col in df.columns:
-            title_column = col
-            break
-    
-    # Sample papers
-    num_available = len(df)
-    if num_available < num_papers:
-        print(f"Warning: Only {num_available} papers available. Extracting all.")
-        papers_to_extract = df
-    else:
-        indices = random.sample(range(num_available), num_papers)
-        papers_to_extract = df.iloc[indices]
-    
-    print(f"Extracting {len(papers_to_extract)} papers to {output_dir}")
-    
-    # Extract and save papers
-    for i, (_, paper) in enumerate(tqdm(papers_to_extract.iterrows(), total=len(papers_to_extract))):
-        # Generate filename from title if available, otherwise use index
-        if title_column and title_column in paper:
-            # Clean title to create a valid filename
-            filename = "".join(c if c.isalnum() or c in " -_" else "_" for c in str(paper[title_column]))
-            filename = filename.strip().replace(" ", "_")[:100]  # Limit length
-            filename = f"{i+1:04d}_{filename}.md"
+    # Memory-map the parquet file; only its first row is read until the
+    # papers to extract have been sampled
+    with pa.memory_map(parquet_file, 'r') as source:
+        parquet = pq.ParquetFile(source)
+        df = _read_head(parquet)
+        
+        # Get the column names to understand the structure
+        print(f"Columns in the dataset: {df.columns.tolist()}")
+        
+        # Determine which column contains the markdown content
+        # This is an assumption that needs to be adjusted based on your actual data
+        content_column = None
+        possible_columns = ['text', 'content', 'markdown', 'mmd', 'body']
+        
+        for col in possible_columns:
+            if col in df.columns:
+                content_column = col
+                break
+        
+        if not content_column:
+            # If none of the expected columns are found, use the first text-like column
+            for col in df.columns:
+                if df[col].dtype == 'object':  # Usually string columns are object type
+                    sample = df[col].iloc[0] if not df.empty else ""
+                    if isinstance(sample, str) and len(sample) > 100:  # Heuristic for content
+                        content_column = col
+                        break
+        
+        if not content_column:
+            raise ValueError("Could not identify a column containing paper content. Please specify manually.")
+        
+        print(f"Using '{content_column}' as the content column")
+        
+        # Get the title column (again, assumption)
+        title_column = None
+        for col in ['title', 'name', 'paper_title']:
+            if col in df.columns:
+                title_column = col
+                break
+        
+        # Sample papers. The metadata columns of the sampled rows are read up
+        # front to build the front matter; they go through pandas, which formats
+        # their values, and their Arrow buffers are released as they are
+        # converted. The content column, which holds nearly all of the data, is
+        # then streamed a row group at a time and written as it arrives
+        num_available = parquet.metadata.num_rows
+        metadata_columns = [name for name in parquet.schema_arrow.names if name != content_column]
+        binary_columns = {field.name for field in parquet.schema_arrow if _is_binary(field.type)}
+        categorical_columns = {field.name for field in parquet.schema_arrow if _is_categorical(field.type)}
+        if num_available < num_papers:
+            print(f"Warning: Only {num_available} papers available. Extracting all.")
+            indices = None
+            table = parquet.read(columns=metadata_columns, use_threads=True)
+            batches = _iter_all_rows(parquet, content_column)
+        else:
+            # The row count comes from the parquet footer, so sampling
+            # indices up front costs O(num_papers) and lets only the row
+            # groups holding sampled rows be decoded; a streaming reservoir
+            # sample would have to decode every row of the file
+            indices = random.sample(range(num_available), num_papers)
+            table = _cast_nullable_ints(parquet, _read_rows(parquet, indices, metadata_columns))
+            batches = _iter_sampled_rows(parquet, indices, content_column)
+        num_extracted = num_available if indices is None else len(indices)
+        papers_to_extract = table.to_pandas(split_blocks=True, self_destruct=True)
+        del table
+        
+        print(f"Extracting {num_extracted} papers to {output_dir}")
+        
+        # Pull each column out as an object array once, so the loop reads plain
+        # values by position instead of building a Series for every row
+        columns = list(papers_to_extract.columns)
+        column_values = [papers_to_extract[col].to_numpy(dtype=object) for col in columns]
+        missing = papers_to_extract.isna().to_numpy()
+        if title_column and title_column != content_column:
+            title_values = column_values[columns.index(title_column)]
         else:
-            filename = f"paper_{i+1:04d}.md"
-        
-        # Get content
-        content = paper[content_column]
-        
-        # Add metadata as YAML front matter if available
-        metadata = []
-        metadata.append("---")
-        for col in df.columns:
-            if col != content_column and not pd.isna(paper[col]):
-                # Skip binary or very long data
-                if isinstance(paper[col], str) and len(paper[col]) < 1000:
-                    metadata.append(f"{col}: {paper[col]}")
-                elif not isinstance(paper[col], (bytes, bytearray)):
-                    metadata.append(f"{col}: {paper[col]}")
-        metadata.append("---\n")
-        
-        # Write to file
-        with open(os.path.join(output_dir, filename), 'w', encoding='utf-8') as f:
-            f.write("\n".join(metadata))
-            f.write(content)
-    
-    print(f"Successfully extracted {len(papers_to_extract)} papers to {output_dir}")
+            title_values = None
+        
+        # Build the YAML front matter column by column: every metadata column
+        # becomes one "col: value" line per paper, or None where the value is
+        # missing. Binary columns are left out of the front matter entirely
+        metadata_lines = []
+        for j, col in enumerate(columns):
+            if col in binary_columns:
+                continue
+            values = column_values[j]
+            skip = missing[:, j]
+            if col in categorical_columns:
+                # Few distinct values: format each one once and look the
+                # lines up by code
+                codes, uniques = pd.factorize(values)
+                if len(uniques) <= len(values) * LOW_CARDINALITY_RATIO:
+                    formatted = [f"{col}: {v}" for v in uniques]
+                    metadata_lines.append([None if s else formatted[c] for c, s in zip(codes.tolist(), skip)])
+                    continue
+            metadata_lines.append([None if s else f"{col}: {v}" for v, s in zip(values, skip)])
+        
+        if metadata_lines:
+            front_matter = [
+                "\n".join(["---", *(line for line in row if line is not None), "---\n"]).encode('utf-8')
+                for row in zip(*metadata_lines)
+            ]
+        else:
+            front_matter = [b"---\n---\n"] * num_extracted
+        del papers_to_extract, column_values, metadata_lines
+        
+        # Extract and save papers. The next batch of content is decoded on a
+        # background thread while this one is encoded, and files are written
+        # on the thread pool; at most MAX_PENDING_WRITES files wait to be
+        # written, so memory stays bounded by a few batches. The progress bar
+        # advances once per batch and redraws at most twice a second
+        pending = deque()
+        # Filenames never contain a separator, so each path is just this
+        # prefix plus the filename
+        prefix = os.path.join(output_dir, "")
+        progress = tqdm(total=num_extracted, mininterval=0.5, miniters=max(1, num_extracted // 200), smoothing=0)
+        with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as executor, progress:
+            for positions, contents in _read_ahead(batches):
+                for i, content in zip(positions, contents):
+                    # Generate filename from title if available, otherwise use index
+                    if title_column:
+                        # Clean title to create a valid filename
+                        title = content.decode('utf-8') if title_values is None else title_values[i]
+                        filename = _sanitize_filename(str(title))
+                        filename = filename.strip().replace(" ", "_")[:100]  # Limit length
+                        filename = f"{i+1:04d}_{filename}.md"
+                    else:
+                        filename = f"paper_{i+1:04d}.md"
+                    
+                    # Write to file: front matter and content go out in one call
+                    parts = [front_matter[i], content]
+                    pending.append(executor.submit(_write_file, prefix + filename, parts))
+                    
+                    # Wait for the oldest writes, raising the first error if any failed
+                    while len(pending) > MAX_PENDING_WRITES:
+                        pending.popleft().result()
+                progress.update(len(contents))
+            
+            while pending:
+                pending.popleft().result()
+    
+    print(f"Successfully extracted {num_extracted} papers to {output_dir}")
+    return num_extracted
+
+# CISI document markers (.I followed by a number) and section directive
+# lines (a line starting with "." names the section that follows it)
+_CISI_DOC_RE = re.compile(r'\.I\s+(\d+)')
+_CISI_SECTION_RE = re.compile(r'^\.(.*)$', re.MULTILINE)
+
+def _parse_cisi_sections(doc_content):
+    """
+    Find the sections of a CISI document in one scan over the directive
+    lines. Sections are returned as spans of ``doc_content`` so that only
+    the ones actually used are ever copied out (see _section_text).
+    
+    Args:
+        doc_content (str): Document text after its .I marker
+    
+    Returns:
+        dict: Lists of (start, end) spans of ``doc_content`` keyed by
+            directive name (e.g. "T", "A", "W")
+    """
+    sections = {}
+    current_section = None
+    # Spans seen since the last saved section; text after an unnamed
+    # directive (or before the first one) carries over to the next section
+    spans = []
+    body_start = 0
+    for match in _CISI_SECTION_RE.finditer(doc_content):
+        spans.append((body_start, match.start()))
+        # Save the previous section
+        if current_section:
+            sections[current_section] = spans
+            spans = []
+        
+        # Start a new section on the line after the directive
+        current_section = match.group(1).strip()
+        body_start = match.end() + 1
+    
+    # Save the last section
+    spans.append((body_start, len(doc_content)))
+    if current_section:
+        sections[current_section] = spans
+    return sections
+
+def _section_text(doc_content, spans):
+    """
+    Build the text of a section found by _parse_cisi_sections.
+    
+    Args:
+        doc_content (str): Document text after its .I marker
+        spans (list): (start, end) spans of the section within doc_content
+    
+    Returns:
+        str: The section text, stripped of surrounding whitespace
+    """
+    if len(spans) == 1:
+        start, end = spans[0]
+        return doc_content[start:end].strip()
+    return ''.join(doc_content[start:end] for start, end in spans).strip()
 
 def convert_cisi_to_markdown(cisi_file, output_dir):
     """
@@ -111,6 +529,9 @@ def convert_cisi_to_markdown(cisi_file, output_dir):
     Args:
         cisi_file (str): Path to the CISI.ALL file
         output_dir (str): Directory to save the markdown files
+    
+    Returns:
+        int: Number of markdown files written
     """
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
@@ -119,53 +540,35 @@ def convert_cisi_to_markdown(cisi_file, output_dir):
     
     # Read the CISI.ALL file
     with open(cisi_file, 'r', encoding='utf-8', errors='replace') as file:
-        content = file.read()
-    
-    # Split the file by document markers (.I followed by a number)
-    documents = re.split(r'\.I\s+(\d+)', content)
+        text = file.read()
     
-    # The first element is empty, skip it
-    documents = documents[1:]
-    
-    # Process documents in pairs (id and content)
-    num_docs = len(documents) // 2
+    # Find the document markers; each document runs up to the next one
+    markers = list(_CISI_DOC_RE.finditer(text))
+    num_docs = len(markers)
     print(f"Found {num_docs} documents in CISI dataset")
     
-    for i in range(0, len(documents), 2):
-        if i+1 >= len(documents):
-            break
-            
-        doc_id = documents[i].strip()
-        doc_content = documents[i+1].strip()
+    # Contents of each file to write, by path. Different documents can map
+    # to the same filename; the last one wins, as it would writing them in
+    # order, and each path is written exactly once
+    files = {}
+    # Filenames never contain a separator, so each path is just this prefix
+    # plus the filename
+    prefix = os.path.join(output_dir, "")
+    for i, marker in enumerate(markers):
+        end = markers[i+1].start() if i+1 < num_docs else len(text)
+        doc_id = marker.group(1)
+        doc_content = text[marker.end():end].strip()
         
         # Parse document content
-        sections = {}
-        current_section = None
-        section_content = []
-        
-        for line in doc_content.split('\n'):
-            if line.startswith('.'):
-                # Save the previous section
-                if current_section:
-                    sections[current_section] = '\n'.join(section_content).strip()
-                    section_content = []
-                
-                # Start a new section
-                current_section = line[1:].strip()
-            else:
-                section_content.append(line)
-        
-        # Save the last section
-        if current_section:
-            sections[current_section] = '\n'.join(section_content).strip()
+        sections = _parse_cisi_sections(doc_content)
         
         # Extract title, author, and content
-        title = sections.get('T', f"Document {doc_id}")
-        author = sections.get('A', 'Unknown')
-        content = sections.get('W', '')
+        title = _section_text(doc_content, sections['T']) if 'T' in sections else f"Document {doc_id}"
+        author = _section_text(doc_content, sections['A']) if 'A' in sections else 'Unknown'
+        content = _section_text(doc_content, sections['W']) if 'W' in sections else ''
         
         # Create filename
-        clean_title = "".join(c if c.isalnum() or c in " -_" else "_" for c in title)
+        clean_title = _sanitize_filename(title)
         clean_title = clean_title.strip().replace(" ", "_")[:100]
         filename = f"cisi_{doc_id.zfill(4)}_{clean_title}.md"
         
@@ -178,18 +581,26 @@ def convert_cisi_to_markdown(cisi_file, output_dir):
         ]
         
         # Add other metadata if available
-        for key, value in sections.items():
+        for key, spans in sections.items():
             if key not in ['T', 'A', 'W', 'X']:
-                markdown.append(f"{key}: {value}")
+                markdown.append(f"{key}: {_section_text(doc_content, spans)}")
         
-        markdown.append("---\n")
-        markdown.append(content)
+        # The closing marker carries the blank line that separates the
+        # front matter from the content
+        markdown.append("---\n\n")
         
-        # Write to file
-        with open(os.path.join(output_dir, filename), 'w', encoding='utf-8') as f:
-            f.write('\n'.join(markdown))
+        # Front matter and content go out in one call, straight from
+        # their own buffers
+        files[prefix + filename] = ['\n'.join(markdown).encode('utf-8'), content.encode('utf-8')]
+    
+    # Write the files on the thread pool, raising the first error if any failed
+    with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as executor:
+        for write in [executor.submit(_write_file, path, parts) for path, parts in files.items()]:
+            write.result()
+    files_written = len(files)
     
     print(f"Successfully converted {num_docs} CISI documents to {output_dir}")
+    return files_written
 
 def main():
     parser = argparse.ArgumentParser(description='Extract papers from various sources and save as markdown')
@@ -0,0 +1,220 @@
+import asyncio
+import io
+import os
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import quote
+
+import api
+
+
+def _running_job():
+    """Register a running job whose JSON is large enough to be compressed."""
+    job_id = str(uuid.uuid4())
+    api._record_job(job_id, {"status": "running", "log": ["x" * 2 * api.app.config['COMPRESS_MIN_SIZE']]})
+    return job_id
+
+
+def _get_etag(client, job_id):
+    response = client.get(f"/api/jobs/{job_id}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    return response.headers["ETag"]
+
+
+def test_long_poll_holds_unchanged_gzip_job():
+    client = api.app.test_client()
+    job_id = _running_job()
+    etag = _get_etag(client, job_id)
+    
+    start = time.monotonic()
+    response = client.get(
+        f"/api/jobs/{job_id}",
+        query_string={"wait": 1},
+        headers={"Accept-Encoding": "gzip", "If-None-Match": etag},
+    )
+    assert response.status_code == 304
+    assert time.monotonic() - start >= 0.9
+
+
+def test_long_poll_returns_gzip_job_when_it_changes():
+    client = api.app.test_client()
+    job_id = _running_job()
+    etag = _get_etag(client, job_id)
+    
+    threading.Timer(0.5, api._log_job, args=(job_id, "progress")).start()
+    start = time.monotonic()
+    response = client.get(
+        f"/api/jobs/{job_id}",
+        query_string={"wait": 5},
+        headers={"Accept-Encoding": "gzip", "If-None-Match": etag},
+    )
+    elapsed = time.monotonic() - start
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert 0.4 <= elapsed < 4
+
+
+def test_copy_upload_keeps_small_spool_in_memory(tmp_path):
+    spool = tempfile.SpooledTemporaryFile(max_size=1024, mode='rb+')
+    spool.write(b"small upload")
+    with open(tmp_path / "copy", "wb") as dst:
+        api._copy_upload(spool, dst)
+    assert not spool._rolled
+    assert (tmp_path / "copy").read_bytes() == b"small upload"
+
+
+def test_copy_upload_copies_rolled_spool(tmp_path):
+    data = bytes(range(256)) * 64
+    spool = tempfile.SpooledTemporaryFile(max_size=1024, mode='rb+')
+    spool.write(data)
+    assert spool._rolled
+    with open(tmp_path / "copy", "wb") as dst:
+        api._copy_upload(spool, dst)
+    assert (tmp_path / "copy").read_bytes() == data
+
+
+def test_cisi_job_runs_on_process_pool(tmp_path):
+    client = api.app.test_client()
+    cisi = b".I 1\n.T\nFirst title\n.A\nSomeone\n.W\nBody text\n.I 2\n.T\nSecond\n.W\nMore text\n"
+    response = client.post(
+        "/api/extract/cisi",
+        data={"file": (io.BytesIO(cisi), "CISI.ALL"), "output_dir": str(tmp_path / "out")},
+    )
+    assert response.status_code == 200
+    job_id = response.get_json()["job_id"]
+    
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").get_json()
+        if job["status"] not in api.ACTIVE_STATUSES:
+            break
+        time.sleep(0.2)
+    assert job["status"] == "completed", job
+    assert job["file_count"] == 2
+
+
+def _worker_state():
+    """Report what importing the api module started in a pool worker."""
+    import api
+    return api._SERVER_PROCESS, [thread.name for thread in threading.enumerate()]
+
+
+def test_pool_workers_skip_server_startup():
+    is_server, threads = api._pool_submit(_worker_state).result(timeout=60)
+    assert not is_server
+    assert "job-reaper" not in threads
+
+
+def test_process_pool_is_rebuilt_after_a_worker_dies():
+    broken = api._pool_submit(os._exit, 1)
+    try:
+        broken.result(timeout=60)
+    except api.BrokenProcessPool:
+        pass
+    else:
+        raise AssertionError("worker exit did not break the pool")
+    assert api._pool_submit(len, "abc").result(timeout=60) == 3
+
+
+def test_files_api_lists_directories_under_output_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "OUTPUT_ROOT", str(tmp_path.resolve()))
+    output_dir = tmp_path / "papers"
+    output_dir.mkdir()
+    (output_dir / "paper_0001.md").write_text("written by the CLI")
+    client = api.app.test_client()
+    
+    response = client.get("/api/files", query_string={"output_dir": str(output_dir)})
+    assert response.status_code == 200
+    assert response.get_json()["files"] == ["paper_0001.md"]
+    
+    response = client.get("/api/files/paper_0001.md", query_string={"output_dir": str(output_dir)})
+    assert response.status_code == 200
+    assert response.data == b"written by the CLI"
+    
+    for outside in (tmp_path, tmp_path / "papers" / ".." / "..", tmp_path / "missing"):
+        response = client.get("/api/files", query_string={"output_dir": str(outside)})
+        assert response.status_code == 404
+
+
+def test_files_api_pages_report_directory_total(tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "OUTPUT_ROOT", str(tmp_path.resolve()))
+    output_dir = tmp_path / "papers"
+    output_dir.mkdir()
+    for i in range(5):
+        (output_dir / f"paper_{i:04d}.md").write_text("text")
+    client = api.app.test_client()
+    
+    # Cached listings, then listings streamed from the directory scan
+    for max_entries in (api.LISTING_CACHE_MAX_ENTRIES, 2):
+        monkeypatch.setattr(api, "LISTING_CACHE_MAX_ENTRIES", max_entries)
+        pages = []
+        for offset in (0, 2, 4, 6):
+            response = client.get("/api/files", query_string={"output_dir": str(output_dir), "offset": offset, "limit": 2})
+            body = response.get_json()
+            pages.append((len(body["files"]), body["file_count"], body["page_count"], body["next_offset"]))
+        assert pages == [(2, 5, 2, 2), (2, 5, 2, 4), (1, 5, 1, None), (0, 5, 0, None)]
+
+
+def test_listing_cache_skips_fresh_directories_and_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "LISTING_CACHE_MAX_DIRS", 2)
+    directories = []
+    for name in ("a", "b", "c"):
+        directory = tmp_path / name
+        directory.mkdir()
+        (directory / "paper_0001.md").write_text("text")
+        directories.append(str(directory))
+    
+    # Just written to: listed, but not cached
+    assert api._cached_listing(directories[0]) == ["paper_0001.md"]
+    assert directories[0] not in api._listing_cache
+    
+    for directory in directories:
+        os.utime(directory, (time.time() - 60, time.time() - 60))
+        assert api._cached_listing(directory) == ["paper_0001.md"]
+    assert directories[0] not in api._listing_cache
+    assert all(directory in api._listing_cache for directory in directories[1:])
+
+
+def test_x_accel_redirect_is_relative_and_quoted(tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "OUTPUT_ROOT", str(tmp_path))
+    monkeypatch.setattr(api, "X_ACCEL_REDIRECT_PREFIX", "/_internal/")
+    output_dir = tmp_path / "papers"
+    output_dir.mkdir()
+    filename = "Zürich 100% #1?.md"
+    (output_dir / filename).write_text("text")
+    
+    response = api.app.test_client().get("/api/files/" + quote(filename), query_string={"output_dir": str(output_dir)})
+    assert response.status_code == 200
+    assert response.headers["X-Accel-Redirect"] == "/_internal/papers/Z%C3%BCrich%20100%25%20%231%3F.md"
+
+
+def test_malformed_wiki_cache_entries_are_ignored(tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "WIKI_CACHE_DIR", str(tmp_path))
+    api._write_wiki_cache("Good", {"etag": None, "fetched": time.time(), "content": "text", "summary": "lead"})
+    assert api._read_wiki_cache("Good")["content"] == "text"
+    
+    for entry in ([], {"fetched": "yesterday", "content": "text", "summary": "lead"}, {"fetched": time.time(), "content": "text"}):
+        api._write_wiki_cache("Bad", entry)
+        assert api._read_wiki_cache("Bad") is None
+
+
+def test_rate_limiter_is_shared_across_event_loops():
+    limiter = api._RateLimiter(10)
+    
+    async def requests(count):
+        for _ in range(count):
+            async with limiter:
+                pass
+    
+    # Two jobs on their own loops take 20 tokens between them: 10 from the
+    # initial burst, then 10 more at 10 per second
+    threads = [threading.Thread(target=asyncio.run, args=(requests(10),)) for _ in range(2)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start >= 0.9
@@ -0,0 +1,12 @@
+import api_client
+
+
+def test_wait_for_job_backs_off_on_equal_statuses(monkeypatch):
+    # A server without long-polling answers at once with a new, equal body
+    responses = iter([{"status": "running", "log": []}] * 4 + [{"status": "completed"}])
+    monkeypatch.setattr(api_client, "get_job_status", lambda api_base, job_id, wait: dict(next(responses)))
+    sleeps = []
+    monkeypatch.setattr(api_client.time, "sleep", sleeps.append)
+    
+    assert api_client.wait_for_job("http://localhost", "job")["status"] == "completed"
+    assert sleeps == [api_client.MIN_POLL_INTERVAL * 2**i for i in range(3)]
@@ -0,0 +1,40 @@
+import random
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from main import convert_cisi_to_markdown, extract_papers
+
+
+def test_sampled_nullable_int_formats_like_full_read(tmp_path):
+    # The only null sits in the first row group, which the sample skips;
+    # pandas still reads the column as float64 when the whole file is read
+    num_rows = 1000
+    years = [2000 + i % 5 for i in range(num_rows)]
+    years[0] = None
+    parquet_file = tmp_path / "papers.parquet"
+    pq.write_table(pa.table({"text": ["body " * 30] * num_rows, "year": years}), parquet_file, row_group_size=100)
+    
+    seed, num_papers = 1, 5
+    random.seed(seed)
+    assert min(random.sample(range(num_rows), num_papers)) >= 100
+    
+    output_dir = tmp_path / "out"
+    assert extract_papers(str(parquet_file), str(output_dir), num_papers=num_papers, seed=seed) == num_papers
+    for path in output_dir.iterdir():
+        year_line = path.read_text().splitlines()[1]
+        assert year_line.startswith("year: ") and year_line.endswith(".0")
+
+
+def test_cisi_duplicate_filenames_keep_last_document(tmp_path):
+    cisi_file = tmp_path / "CISI.ALL"
+    cisi_file.write_text(
+        ".I 1\n.T\nSame title\n.A\nFirst\n.W\nfirst body\n"
+        ".I 1\n.T\nSame title\n.A\nSecond\n.W\nsecond body\n"
+        ".I 2\n.T\nOther\n.W\nother body\n"
+    )
+    output_dir = tmp_path / "out"
+    assert convert_cisi_to_markdown(str(cisi_file), str(output_dir)) == 2
+    assert sorted(p.name for p in output_dir.iterdir()) == ["cisi_0001_Same_title.md", "cisi_0002_Other.md"]
+    text = (output_dir / "cisi_0001_Same_title.md").read_text()
+    assert "author: Second" in text and text.endswith("second body")